@@ -0,0 +1,325 @@
+# automation/draft_worker.py
+#
+# Background Gmail draft delivery.
+# /process_ticket journals a job (group-committed with the ticket's other
+# records, see src/journal.py) and returns immediately; a worker thread
+# creates the Gmail draft with retries and writes gmail_draft_id back via
+# draft_store. Jobs live in SQLite, so a restart resumes pending deliveries
+# (at-least-once: a job interrupted mid-call is retried).
+# Jobs whose draft was rejected/sent before delivery are CANCELLED; FAILED
+# jobs can be re-queued with retry_failed():
+#   python -m automation.draft_worker retry-failed [ticket_id ...]
+
+import argparse
+import sqlite3
+import threading
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+
+from src.draft_store import PENDING_STATUSES, load_draft, set_gmail_draft_id
+from src.metrics import stage
+
+DB_PATH = "logs/draft_jobs.db"
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 300.0
+POLL_SECONDS = 1.0
+WORKER_THREADS = 2
+
+Path("logs").mkdir(exist_ok=True)
+
+_local = threading.local()
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS draft_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ticket_id TEXT,
+        to_email TEXT,
+        subject TEXT,
+        body TEXT,
+        status TEXT,
+        attempts INTEGER DEFAULT 0,
+        next_attempt_at REAL,
+        last_error TEXT,
+        gmail_draft_id TEXT,
+        created_at TEXT,
+        updated_at TEXT
+    )
+"""
+
+
+def _get_conn():
+    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(_SCHEMA)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_draft_jobs_due ON draft_jobs(status, next_attempt_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_draft_jobs_ticket ON draft_jobs(ticket_id)")
+    return conn
+
+
+def make_job_record(ticket_id, to_email, subject, body):
+    return {
+        "ticket_id": ticket_id,
+        "to_email": to_email,
+        "subject": subject,
+        "body": body,
+        "next_attempt_at": time.time(),
+        "created_at": datetime.utcnow().isoformat()
+    }
+
+
+def save_jobs(records, durable: bool = False) -> int:
+    """
+    Insert many QUEUED jobs in one transaction (called by the journal's
+    writer with a whole group), then wake the worker.
+    durable=True makes this commit fsync (synchronous=FULL).
+    """
+    if not records:
+        return 0
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _get_conn()
+    conn.execute(f"PRAGMA synchronous={'FULL' if durable else 'NORMAL'}")
+    with conn:
+        conn.executemany(
+            "INSERT INTO draft_jobs (ticket_id, to_email, subject, body, status, attempts, "
+            "next_attempt_at, created_at, updated_at) VALUES (?,?,?,?,'QUEUED',0,?,?,?)",
+            [
+                (r["ticket_id"], r["to_email"], r["subject"], r["body"],
+                 r["next_attempt_at"], r["created_at"], r["created_at"])
+                for r in records
+            ]
+        )
+    if _worker is not None:
+        _worker.wake()
+    return len(records)
+
+
+def _default_create_draft(to_email, subject, body):
+    # imported lazily so enqueueing never needs the Gmail client
+    from automation.gmail_draft import create_draft
+    return create_draft(to_email=to_email, subject=subject, body=body)
+
+
+class DraftWorker:
+    """
+    Persistent job queue + worker threads for Gmail draft creation.
+    """
+
+    def __init__(self, create_draft_fn=None, threads=WORKER_THREADS):
+        self.create_draft_fn = create_draft_fn or _default_create_draft
+        self.threads = threads
+        self._conn = _get_conn()
+        self._db_lock = threading.Lock()
+        self._wake = threading.Condition()
+        self._stop = threading.Event()
+        self._workers = []
+        self._in_flight = 0
+
+    # ----------------------------
+    # Queue API
+    # ----------------------------
+    def enqueue(self, ticket_id, to_email, subject, body):
+        """One job, committed on its own; the ticket pipeline journals jobs instead."""
+        save_jobs([make_job_record(ticket_id, to_email, subject, body)], durable=True)
+        self.wake()
+
+    def wake(self):
+        with self._wake:
+            self._wake.notify()
+
+    def job_status(self, ticket_id):
+        """Latest delivery job for a ticket, or None."""
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT status, attempts, last_error, gmail_draft_id, created_at, updated_at "
+                "FROM draft_jobs WHERE ticket_id = ? ORDER BY id DESC LIMIT 1",
+                (ticket_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def counts(self):
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS n FROM draft_jobs GROUP BY status"
+            ).fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+    def retry_failed(self, ticket_ids=None):
+        """
+        Re-queue FAILED jobs (all, or only those for `ticket_ids`) with a
+        fresh attempt budget. Returns the number of jobs re-queued.
+        """
+        now = time.time()
+        sql = ("UPDATE draft_jobs SET status = 'QUEUED', attempts = 0, next_attempt_at = ?, updated_at = ? "
+               "WHERE status = 'FAILED'")
+        with self._db_lock:
+            if ticket_ids is None:
+                cur = self._conn.execute(sql, (now, datetime.utcnow().isoformat()))
+                n = cur.rowcount
+            else:
+                n = 0
+                ticket_ids = list(ticket_ids)
+                for start in range(0, len(ticket_ids), 500):
+                    chunk = ticket_ids[start:start + 500]
+                    cur = self._conn.execute(
+                        sql + f" AND ticket_id IN ({','.join('?' * len(chunk))})",
+                        (now, datetime.utcnow().isoformat(), *chunk)
+                    )
+                    n += cur.rowcount
+            self._conn.commit()
+        if n:
+            self.wake()
+        return n
+
+    # ----------------------------
+    # Worker loop
+    # ----------------------------
+    def _claim(self):
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT * FROM draft_jobs WHERE status = 'QUEUED' AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT 1",
+                (time.time(),)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE draft_jobs SET status = 'IN_PROGRESS', attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ?",
+                (datetime.utcnow().isoformat(), row["id"])
+            )
+            self._conn.commit()
+            self._in_flight += 1
+        return dict(row)
+
+    def _finish(self, job_id, status, error=None, gmail_draft_id=None, retry_at=None):
+        with self._db_lock:
+            self._conn.execute(
+                "UPDATE draft_jobs SET status = ?, last_error = ?, gmail_draft_id = ?, "
+                "next_attempt_at = COALESCE(?, next_attempt_at), updated_at = ? WHERE id = ?",
+                (status, error, gmail_draft_id, retry_at, datetime.utcnow().isoformat(), job_id)
+            )
+            self._conn.commit()
+            self._in_flight -= 1
+
+    def _draft_status(self, ticket_id):
+        draft = load_draft(ticket_id)
+        if draft is None:
+            # the draft row may still be queued in the journal (async durability)
+            from src.journal import get_journal
+            get_journal().flush()
+            draft = load_draft(ticket_id)
+        return draft["status"] if draft else None
+
+    def _deliver(self, job):
+        # no Gmail draft for a ticket that was rejected/sent meanwhile
+        status = self._draft_status(job["ticket_id"])
+        if status is not None and status not in PENDING_STATUSES:
+            self._finish(job["id"], "CANCELLED", error=f"draft is {status}")
+            print(f"[draft_worker] ticket {job['ticket_id']} is {status}, delivery cancelled")
+            return
+
+        try:
+            with stage("gmail_create_draft"):
+                draft = self.create_draft_fn(job["to_email"], job["subject"], job["body"])
+        except Exception as e:
+            attempts = job["attempts"] + 1
+            if attempts >= MAX_ATTEMPTS:
+                traceback.print_exc()
+                self._finish(job["id"], "FAILED", error=str(e))
+                print(f"[draft_worker] giving up on ticket {job['ticket_id']} after {attempts} attempts: {e}")
+            else:
+                delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)))
+                self._finish(job["id"], "QUEUED", error=str(e), retry_at=time.time() + delay)
+                print(f"[draft_worker] ticket {job['ticket_id']} attempt {attempts} failed, retry in {delay:.0f}s: {e}")
+            return
+
+        gmail_draft_id = draft["draft_id"]
+        # leaves the status alone: the draft may have been rejected/overridden meanwhile
+        if not set_gmail_draft_id(job["ticket_id"], gmail_draft_id):
+            # the draft row may still be queued in the journal (async durability)
+            from src.journal import get_journal
+            get_journal().flush()
+            set_gmail_draft_id(job["ticket_id"], gmail_draft_id)
+        self._finish(job["id"], "DONE", gmail_draft_id=gmail_draft_id)
+
+    def _run(self):
+        while not self._stop.is_set():
+            job = self._claim()
+            if job is None:
+                with self._wake:
+                    self._wake.wait(POLL_SECONDS)
+                continue
+            try:
+                self._deliver(job)
+            except Exception:
+                # never let one bad job kill the worker thread
+                traceback.print_exc()
+                self._finish(job["id"], "FAILED", error="worker error")
+
+    def start(self):
+        if self._workers:
+            return
+        # jobs left IN_PROGRESS by a previous process never completed
+        with self._db_lock:
+            self._conn.execute("UPDATE draft_jobs SET status = 'QUEUED' WHERE status = 'IN_PROGRESS'")
+            self._conn.commit()
+        self._stop.clear()
+        for i in range(self.threads):
+            t = threading.Thread(target=self._run, name=f"draft-worker-{i}", daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    def stop(self, timeout=10.0):
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        for t in self._workers:
+            t.join(timeout)
+        self._workers = []
+
+    def drain(self, timeout=None):
+        """
+        Block until every job is DONE, FAILED or CANCELLED, scheduled retries included.
+        Returns False if `timeout` expires first.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while deadline is None or time.time() < deadline:
+            with self._db_lock:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM draft_jobs WHERE status IN ('QUEUED', 'IN_PROGRESS')"
+                ).fetchone()
+                busy = row[0] > 0 or self._in_flight > 0
+            if not busy:
+                return True
+            time.sleep(0.05)
+        return False
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = DraftWorker()
+    return _worker
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Draft delivery queue maintenance.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    retry = sub.add_parser("retry-failed", help="re-queue FAILED jobs (a running server picks them up)")
+    retry.add_argument("ticket_ids", nargs="*", help="only these tickets (default: all)")
+    args = parser.parse_args()
+
+    if args.command == "retry-failed":
+        n = DraftWorker().retry_failed(args.ticket_ids or None)
+        print(f"✅ Re-queued {n} failed draft job(s)")
@@ -0,0 +1,287 @@
+# automation/fake_gmail.py
+#
+# Local stand-in for the Gmail REST API, for offline testing:
+#   python -m automation.fake_gmail --port 8765
+#   GMAIL_API_ROOT=http://127.0.0.1:8765 uvicorn src.app_sklearn:app
+# Implements drafts.create, drafts.get, drafts.send and the /batch endpoint.
+# Or fully in-process, no HTTP and no google client (see automation/gmail_service.py):
+#   GMAIL_TRANSPORT=fake FAKE_GMAIL_LATENCY_SECONDS=0.05 uvicorn src.app_sklearn:app
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+_DRAFTS = re.compile(r"^/gmail/v1/users/[^/]+/drafts$")
+_SEND = re.compile(r"^/gmail/v1/users/[^/]+/drafts/send$")
+_DRAFT = re.compile(r"^/gmail/v1/users/[^/]+/drafts/(?P<id>[^/]+)$")
+
+
+class FakeGmail:
+    """
+    In-memory Gmail state shared by all request threads.
+    latency_seconds is added per API call; error_rate fails calls with 503.
+    Set drop_next_batch_after = n to make the next in-process batch apply
+    its first n calls and then lose the connection before any response.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0, error_rate: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.error_rate = error_rate
+        self.drafts = {}
+        self.sent = []
+        self.batch_requests = 0
+        self.calls = 0
+        self.errors = 0
+        self.drop_next_batch_after = None
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def _new_id(self, prefix):
+        with self._lock:
+            self._next_id += 1
+            return f"{prefix}-{self._next_id}"
+
+    def handle(self, method, path, body):
+        """Return (status, json-able payload) for one API call."""
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        failed = bool(self.error_rate) and random.random() < self.error_rate
+        with self._lock:
+            self.calls += 1
+            self.errors += failed
+        if failed:
+            return 503, {"error": {"code": 503, "message": "fake backend error"}}
+
+        path = urlparse(path).path
+        payload = json.loads(body) if body else {}
+
+        if method == "POST" and _DRAFTS.match(path):
+            draft_id = self._new_id("draft")
+            message_id = self._new_id("msg")
+            with self._lock:
+                self.drafts[draft_id] = {"message_id": message_id, "message": payload.get("message", {})}
+            return 200, {"id": draft_id, "message": {"id": message_id}}
+
+        if method == "GET" and _DRAFT.match(path) and not _SEND.match(path):
+            draft_id = _DRAFT.match(path).group("id")
+            with self._lock:
+                draft = self.drafts.get(draft_id)
+            if draft is None:
+                return 404, {"error": {"code": 404, "message": f"Draft {draft_id} not found"}}
+            return 200, {"id": draft_id, "message": {"id": draft["message_id"]}}
+
+        if method == "POST" and _SEND.match(path):
+            draft_id = payload.get("id")
+            with self._lock:
+                draft = self.drafts.pop(draft_id, None)
+                if draft is not None:
+                    self.sent.append(draft_id)
+            if draft is None:
+                return 404, {"error": {"code": 404, "message": f"Draft {draft_id} not found"}}
+            return 200, {"id": draft["message_id"], "threadId": self._new_id("thread")}
+
+        return 404, {"error": {"code": 404, "message": f"No fake route for {method} {path}"}}
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "batch_requests": self.batch_requests,
+                "drafts": len(self.drafts),
+                "sent": len(self.sent)
+            }
+
+
+# ----------------------------
+# In-process client
+# ----------------------------
+class FakeGmailError(Exception):
+    """Raised by FakeGmailService for non-200 responses (stands in for HttpError)."""
+
+    def __init__(self, status, message):
+        super().__init__(f"<FakeGmail {status}: {message}>")
+        self.status = status
+
+
+class _FakeRequest:
+
+    def __init__(self, gmail, path, body, method="POST"):
+        self.gmail = gmail
+        self.path = path
+        self.body = body
+        self.method = method
+
+    def execute(self):
+        body = json.dumps(self.body).encode("utf-8") if self.body is not None else b""
+        status, payload = self.gmail.handle(self.method, self.path, body)
+        if status != 200:
+            raise FakeGmailError(status, payload["error"]["message"])
+        return payload
+
+
+class _FakeBatch:
+
+    def __init__(self, gmail, callback):
+        self.gmail = gmail
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id or str(len(self.requests)), request))
+
+    def execute(self):
+        self.gmail.batch_requests += 1
+        drop_after, self.gmail.drop_next_batch_after = self.gmail.drop_next_batch_after, None
+        if drop_after is not None:
+            # the server applied the first calls, but no response made it back
+            for _, request in self.requests[:drop_after]:
+                try:
+                    request.execute()
+                except FakeGmailError:
+                    pass
+            raise ConnectionResetError("fake Gmail dropped the batch connection")
+        for request_id, request in self.requests:
+            try:
+                response, error = request.execute(), None
+            except FakeGmailError as e:
+                response, error = None, e
+            self.callback(request_id, response, error)
+
+
+class _FakeDrafts:
+
+    def __init__(self, gmail):
+        self.gmail = gmail
+
+    def create(self, userId, body):
+        return _FakeRequest(self.gmail, f"/gmail/v1/users/{userId}/drafts", body)
+
+    def get(self, userId, id, format=None):
+        return _FakeRequest(self.gmail, f"/gmail/v1/users/{userId}/drafts/{id}", None, method="GET")
+
+    def send(self, userId, body):
+        return _FakeRequest(self.gmail, f"/gmail/v1/users/{userId}/drafts/send", body)
+
+
+class FakeGmailService:
+    """
+    The subset of the googleapiclient Gmail service used by gmail_draft /
+    gmail_send, answered directly by a FakeGmail (no sockets). Thread-safe.
+    """
+
+    def __init__(self, gmail: FakeGmail):
+        self.gmail = gmail
+
+    def users(self):
+        return self
+
+    def drafts(self):
+        return _FakeDrafts(self.gmail)
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(self.gmail, callback)
+
+
+# ----------------------------
+# HTTP server
+# ----------------------------
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 503: "Service Unavailable"}
+
+
+def _split_http_part(raw: bytes):
+    """Parse one application/http batch part into (method, path, body)."""
+    head, _, body = raw.replace(b"\r\n", b"\n").partition(b"\n\n")
+    request_line = head.split(b"\n", 1)[0].decode("utf-8")
+    method, path, _ = request_line.split(" ", 2)
+    return method, path, body.strip()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    gmail = None  # set per server class
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status, body: bytes, content_type="application/json; charset=UTF-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+
+        if urlparse(self.path).path == "/batch":
+            return self._handle_batch(body)
+
+        status, payload = self.gmail.handle("POST", self.path, body)
+        self._send(status, json.dumps(payload).encode("utf-8"))
+
+    def do_GET(self):
+        status, payload = self.gmail.handle("GET", self.path, b"")
+        self._send(status, json.dumps(payload).encode("utf-8"))
+
+    def _handle_batch(self, body):
+        self.gmail.batch_requests += 1
+        header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8")
+        message = BytesParser().parsebytes(header + body)
+
+        boundary = f"batch_{uuid.uuid4().hex}"
+        out = []
+        for part in message.get_payload():
+            method, path, part_body = _split_http_part(part.get_payload(decode=False).encode("utf-8"))
+            status, payload = self.gmail.handle(method, path, part_body)
+            content_id = part["Content-ID"].strip()
+            inner = (
+                f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(payload)}"
+            )
+            out.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id[1:-1]}>\r\n\r\n"
+                f"{inner}\r\n"
+            )
+        out.append(f"--{boundary}--\r\n")
+        self._send(200, "".join(out).encode("utf-8"), f"multipart/mixed; boundary={boundary}")
+
+
+def start_fake_gmail(host="127.0.0.1", port=0, latency_seconds=0.0, error_rate=0.0):
+    """
+    Start the fake in a daemon thread.
+    Returns (server, gmail_state, root_url); call server.shutdown() to stop.
+    """
+    gmail = FakeGmail(latency_seconds=latency_seconds, error_rate=error_rate)
+    handler = type("FakeGmailHandler", (_Handler,), {"gmail": gmail})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="fake-gmail", daemon=True).start()
+    root_url = f"http://{host}:{server.server_address[1]}/"
+    return server, gmail, root_url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local fake Gmail API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added per call")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, _, url = start_fake_gmail(args.host, args.port, args.latency, args.error_rate)
+    print(f"✅ Fake Gmail listening on {url} (set GMAIL_API_ROOT={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -3,6 +3,11 @@
 import base64
 from automation.gmail_service import get_gmail_service
 
+# Gmail caps batches at 100 calls and recommends <= 50 to avoid rate limiting
+BATCH_CHUNK_SIZE = 50
+# extra rounds for drafts confirmed unsent after a transport-level batch failure
+BATCH_RETRIES = 2
+
 def send_draft(draft_id: str):
     service = get_gmail_service()
 
@@ -15,3 +20,89 @@ def send_draft(draft_id: str):
         "message_id": sent["id"],
         "thread_id": sent.get("threadId")
     }
+
+
+def _http_status(e):
+    """HTTP status of a googleapiclient HttpError / FakeGmailError, else None."""
+    status = getattr(e, "status", None)
+    if status is None:
+        status = getattr(getattr(e, "resp", None), "status", None)
+    return int(status) if status is not None else None
+
+
+def _draft_exists(service, draft_id):
+    """
+    True/False from drafts.get (Gmail deletes a draft once it is sent);
+    None when Gmail could not be asked.
+    """
+    try:
+        service.users().drafts().get(userId="me", id=draft_id, format="minimal").execute()
+        return True
+    except Exception as e:
+        if _http_status(e) == 404:
+            return False
+        return None
+
+
+def send_drafts_batch(draft_ids, chunk_size: int = BATCH_CHUNK_SIZE, retries: int = BATCH_RETRIES, service=None):
+    """
+    Send many drafts through Gmail's batch HTTP endpoint, `chunk_size`
+    drafts per round trip.
+    Returns {draft_id: {"message_id", "thread_id"} | {"error": str, "unknown": bool}}.
+
+    A transport-level failure (connection reset, timeout) says nothing about
+    which drafts Gmail already sent, so those drafts are re-checked with
+    drafts.get before anything is retried:
+      - gone (404): it was sent -> success with message_id None ("unconfirmed")
+      - still there: not sent -> retried, up to `retries` more rounds
+      - check failed: reported with "unknown": True and never retried
+    Pass `service` to build the client up front (a failure there sends nothing).
+    """
+    service = service or get_gmail_service()
+    results = {}
+
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            results[request_id] = {"error": str(exception)}
+        else:
+            results[request_id] = {
+                "message_id": response["id"],
+                "thread_id": response.get("threadId")
+            }
+
+    draft_ids = list(dict.fromkeys(draft_ids))
+    for start in range(0, len(draft_ids), chunk_size):
+        pending = draft_ids[start:start + chunk_size]
+        for attempt in range(retries + 1):
+            batch = service.new_batch_http_request(callback=on_response)
+            for draft_id in pending:
+                batch.add(
+                    service.users().drafts().send(userId="me", body={"id": draft_id}),
+                    request_id=draft_id
+                )
+            try:
+                batch.execute()
+                break
+            except Exception as e:
+                transport_error = str(e)
+
+            retry = []
+            for draft_id in pending:
+                if draft_id in results:
+                    continue  # its own response arrived before the failure
+                exists = _draft_exists(service, draft_id)
+                if exists is False:
+                    results[draft_id] = {"message_id": None, "thread_id": None, "unconfirmed": True}
+                elif exists is True:
+                    retry.append(draft_id)
+                else:
+                    results[draft_id] = {"error": transport_error, "unknown": True}
+            pending = retry
+            if not pending:
+                break
+        else:
+            # still present after every retry: definitely not sent
+            for draft_id in pending:
+                results.setdefault(draft_id, {"error": transport_error})
+
+    return results
@@ -1,21 +1,129 @@
 # automation/gmail_service.py
 
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient import discovery_cache
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
+from datetime import datetime, timedelta
+import httplib2
+import json
 import os
+import threading
 
 SCOPES = ["https://www.googleapis.com/auth/gmail.modify"]
 TOKEN_PATH = "automation/token.json"
 
+# refresh a little before expiry so in-flight calls never carry a stale token
+REFRESH_MARGIN = timedelta(minutes=5)
+HTTP_TIMEOUT_SECONDS = 30
+# point the client at another server (e.g. automation/fake_gmail.py); no OAuth then
+API_ROOT = os.environ.get("GMAIL_API_ROOT")
+# "api" = googleapiclient (Gmail or API_ROOT); "fake" = in-process FakeGmail, for load tests
+GMAIL_TRANSPORT = os.environ.get("GMAIL_TRANSPORT", "api").lower()
+FAKE_GMAIL_LATENCY_SECONDS = float(os.environ.get("FAKE_GMAIL_LATENCY_SECONDS", "0.05"))
+FAKE_GMAIL_ERROR_RATE = float(os.environ.get("FAKE_GMAIL_ERROR_RATE", "0"))
+
+_creds = None
+_creds_lock = threading.Lock()
+_discovery_doc = None
+_fake_service = None
+# httplib2 connections are not thread-safe: one keep-alive client per thread
+_local = threading.local()
+
+
+def _needs_refresh(creds) -> bool:
+    if not creds.valid:
+        return True
+    if creds.expiry is None:
+        return False
+    return creds.expiry - datetime.utcnow() < REFRESH_MARGIN
+
+
+def get_credentials():
+    """
+    Process-wide credentials, loaded once and refreshed (under a lock)
+    only when missing, invalid or within REFRESH_MARGIN of expiry.
+    """
+    global _creds
+    creds = _creds
+    if creds is not None and not _needs_refresh(creds):
+        return creds
+
+    with _creds_lock:
+        if _creds is None:
+            if not os.path.exists(TOKEN_PATH):
+                raise RuntimeError("token.json not found. Run gmail_auth.py first.")
+            _creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+
+        if _needs_refresh(_creds) and _creds.refresh_token:
+            _creds.refresh(Request())
+            with open(TOKEN_PATH, "w", encoding="utf-8") as f:
+                f.write(_creds.to_json())
+        return _creds
+
+
+def _get_discovery_doc():
+    global _discovery_doc
+    if _discovery_doc is None:
+        doc = discovery_cache.get_static_doc("gmail", "v1")
+        doc = json.loads(doc) if doc else None
+        if doc is not None and API_ROOT:
+            doc["rootUrl"] = doc["baseUrl"] = API_ROOT.rstrip("/") + "/"
+        _discovery_doc = doc
+    return _discovery_doc
+
+
+def use_fake_gmail(latency_seconds=FAKE_GMAIL_LATENCY_SECONDS, error_rate=FAKE_GMAIL_ERROR_RATE):
+    """
+    Route every Gmail call in this process to a fresh in-process FakeGmail.
+    Returns the FakeGmail so callers can inspect drafts/sent/get_stats().
+    """
+    global _fake_service
+    from automation.fake_gmail import FakeGmail, FakeGmailService
+
+    service = FakeGmailService(FakeGmail(latency_seconds=latency_seconds, error_rate=error_rate))
+    _fake_service = service
+    return service.gmail
+
+
 def get_gmail_service():
-    if not os.path.exists(TOKEN_PATH):
-        raise RuntimeError("token.json not found. Run gmail_auth.py first.")
+    """
+    Cached Gmail client for the calling thread.
+    Discovery is parsed once per process and each thread keeps its HTTP
+    connection alive across calls; credentials are shared.
+    """
+    if _fake_service is None and GMAIL_TRANSPORT == "fake":
+        with _creds_lock:
+            if _fake_service is None:
+                use_fake_gmail()
+    if _fake_service is not None:
+        return _fake_service
+
+    creds = None if API_ROOT else get_credentials()
 
-    creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+    service = getattr(_local, "service", None)
+    if service is not None and getattr(_local, "creds", None) is creds:
+        return service
 
-    if creds.expired and creds.refresh_token:
-        creds.refresh(Request())
+    http = httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS)
+    if creds is not None:
+        http = AuthorizedHttp(creds, http=http)
+    doc = _get_discovery_doc()
+    if doc is not None:
+        service = build_from_document(doc, http=http)
+    else:
+        service = build("gmail", "v1", http=http)
 
-    service = build("gmail", "v1", credentials=creds)
+    _local.service = service
+    _local.creds = creds
     return service
+
+
+def reset_gmail_service():
+    """Drop cached credentials/clients (e.g. after re-running gmail_auth.py)."""
+    global _creds, _fake_service
+    with _creds_lock:
+        _creds = None
+        _fake_service = None
+    _local.__dict__.clear()
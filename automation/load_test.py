@@ -0,0 +1,309 @@
+# automation/load_test.py
+#
+# Open-loop load test of /process_ticket with Gmail faked in-process:
+#   python -m automation.load_test tickets.jsonl --rates 5,10,20,40 --duration 30
+#   python -m automation.load_test tickets.jsonl --gmail-latency 0.2 --gmail-error-rate 0.05
+# Or against a running server (start it with GMAIL_TRANSPORT=fake):
+#   python -m automation.load_test tickets.jsonl --url http://127.0.0.1:8000 --rates 10,20
+#
+# Tickets (SupportTicket JSONL, as for run_automation) are replayed round-robin
+# at each target rate for --duration seconds. Latency is measured from the
+# scheduled send time, so queueing behind a saturated server is included.
+# A rate is sustainable when throughput keeps up (>= 95%), errors stay under
+# --max-error-rate, end-to-end p99 under --slo-ms and the Gmail draft backlog
+# clears within --delivery-timeout; the run stops at the first rate that is not.
+# With --url the backlog is polled through the app's /draft_delivery endpoint.
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from automation.run_automation import load_tickets
+from automation import draft_worker
+
+KEEP_UP_RATIO = 0.95
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {
+        "count": len(values),
+        "p50_ms": round(pick(0.50), 2),
+        "p95_ms": round(pick(0.95), 2),
+        "p99_ms": round(pick(0.99), 2),
+        "max_ms": round(values[-1], 2)
+    }
+
+
+# ----------------------------
+# Senders: one ticket -> per-stage timings (ms)
+# ----------------------------
+def in_process_sender():
+    from src.ticket_pipeline import build_query, handle_ticket
+    from src.rag_generate import generate_answer
+
+    def send(ticket, scheduled):
+        started = time.perf_counter()
+        rag_output = generate_answer(build_query(ticket))
+        retrieved = time.perf_counter()
+        handle_ticket(ticket, rag_output)  # decide + journal group commit + enqueue draft job
+        done = time.perf_counter()
+        return {
+            "queue": (started - scheduled) * 1000,
+            "rag": (retrieved - started) * 1000,
+            "handle": (done - retrieved) * 1000,
+            "e2e": (done - scheduled) * 1000
+        }
+
+    return send
+
+
+def http_sender(url, timeout=60):
+    endpoint = url.rstrip("/") + "/process_ticket"
+
+    def send(ticket, scheduled):
+        request = urllib.request.Request(
+            endpoint,
+            data=ticket.model_dump_json().encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        started = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+        done = time.perf_counter()
+        return {
+            "queue": (started - scheduled) * 1000,
+            "request": (done - started) * 1000,
+            "e2e": (done - scheduled) * 1000
+        }
+
+    return send
+
+
+def _send_safely(send, ticket, scheduled):
+    try:
+        return send(ticket, scheduled)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}", "e2e": (time.perf_counter() - scheduled) * 1000}
+
+
+# ----------------------------
+# Draft delivery (async stage: the worker's job table, or /draft_delivery over HTTP)
+# ----------------------------
+PENDING = ("QUEUED", "IN_PROGRESS")
+DELIVERY_POLL_CONCURRENCY = 16
+
+
+def _summarise_delivery(rows):
+    """rows: (status, created_at, updated_at) per job."""
+    statuses = {}
+    latencies = []
+    for status, created_at, updated_at in rows:
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == "DONE":
+            delta = datetime.fromisoformat(updated_at) - datetime.fromisoformat(created_at)
+            latencies.append(delta.total_seconds() * 1000)
+    return {"jobs": statuses, "latency": percentiles(latencies)}
+
+
+def delivery_stats(tag, timeout):
+    """Wait up to `timeout` s for this step's draft jobs, then summarise enqueue -> DONE latency."""
+    conn = sqlite3.connect(draft_worker.DB_PATH, timeout=30)
+    try:
+        deadline = time.time() + timeout
+        while True:
+            rows = conn.execute(
+                "SELECT status, created_at, updated_at FROM draft_jobs WHERE ticket_id LIKE ?",
+                (f"{tag}-%",)
+            ).fetchall()
+            pending = sum(1 for status, _, _ in rows if status in PENDING)
+            if pending == 0 or time.time() >= deadline:
+                break
+            time.sleep(0.1)
+    finally:
+        conn.close()
+    return _summarise_delivery(rows)
+
+
+def http_delivery_stats(url, ticket_ids, timeout, request_timeout=10):
+    """
+    Same as delivery_stats for a server in another process: polls
+    GET /draft_delivery/{ticket_id}, re-asking only for jobs still pending.
+    Tickets with no job (404) are not counted.
+    """
+    base = url.rstrip("/") + "/draft_delivery/"
+
+    def fetch(ticket_id):
+        try:
+            with urllib.request.urlopen(base + ticket_id, timeout=request_timeout) as response:
+                job = json.loads(response.read())
+            return ticket_id, (job["status"], job.get("created_at"), job.get("updated_at"))
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return ticket_id, None
+            return ticket_id, ("POLL_ERROR", None, None)
+        except OSError:
+            return ticket_id, ("POLL_ERROR", None, None)
+
+    jobs = {}
+    todo = list(ticket_ids)
+    deadline = time.time() + timeout
+    with ThreadPoolExecutor(max_workers=DELIVERY_POLL_CONCURRENCY) as pool:
+        while todo:
+            for ticket_id, job in pool.map(fetch, todo):
+                if job is None:
+                    jobs.pop(ticket_id, None)
+                else:
+                    jobs[ticket_id] = job
+            todo = [t for t in todo if t in jobs and jobs[t][0] in PENDING + ("POLL_ERROR",)]
+            if not todo or time.time() >= deadline:
+                break
+            time.sleep(0.2)
+    return _summarise_delivery(jobs.values())
+
+
+# ----------------------------
+# One load step
+# ----------------------------
+def run_step(send, tickets, rate, duration, concurrency, tag):
+    n = max(1, int(rate * duration))
+    futures = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        t0 = time.perf_counter()
+        for i in range(n):
+            scheduled = t0 + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            source = tickets[i % len(tickets)]
+            ticket = source.model_copy(update={"ticket_id": f"{tag}-{i}"})
+            futures.append(pool.submit(_send_safely, send, ticket, scheduled))
+        results = [f.result() for f in futures]
+        elapsed = time.perf_counter() - t0
+
+    errors = [r["error"] for r in results if "error" in r]
+    stages = sorted({k for r in results for k in r if k != "error"})
+    return {
+        "target_rate": rate,
+        "sent": n,
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+        "throughput": round((n - len(errors)) / elapsed, 2),
+        "elapsed_seconds": round(elapsed, 2),
+        "stages": {
+            stage: percentiles([r[stage] for r in results if stage in r and "error" not in r])
+            for stage in stages
+        }
+    }
+
+
+def sustainable(step, slo_ms, max_error_rate):
+    e2e = step["stages"].get("e2e", {})
+    return (
+        step["throughput"] >= KEEP_UP_RATIO * step["target_rate"]
+        and step["errors"] <= max_error_rate * step["sent"]
+        and e2e.get("p99_ms", float("inf")) <= slo_ms
+        and not any(s in step["draft_delivery"]["jobs"] for s in PENDING + ("POLL_ERROR",))
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test ticket processing with a fake Gmail.")
+    parser.add_argument("path", help="JSONL file of tickets")
+    parser.add_argument("--url", help="hit a running app over HTTP instead of calling the pipeline in-process")
+    parser.add_argument("--rates", default="5,10,20,40", help="target tickets/s, one step each")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per step")
+    parser.add_argument("--concurrency", type=int, default=32, help="max in-flight tickets")
+    parser.add_argument("--slo-ms", type=float, default=2000.0, help="end-to-end p99 target")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--gmail-latency", type=float, default=0.05, help="fake Gmail seconds per call (in-process)")
+    parser.add_argument("--gmail-error-rate", type=float, default=0.0, help="fake Gmail failure rate (in-process)")
+    parser.add_argument("--draft-workers", type=int, default=draft_worker.WORKER_THREADS)
+    parser.add_argument("--delivery-timeout", type=float, default=30.0, help="wait for draft jobs after each step")
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    tickets, rejected = load_tickets(args.path)
+    if not tickets:
+        raise SystemExit(f"❌ No valid tickets in {args.path} ({len(rejected)} lines rejected)")
+
+    gmail = None
+    if args.url:
+        send = http_sender(args.url)
+    else:
+        from automation.gmail_service import use_fake_gmail
+        from src.chroma_retriever import warmup_steps
+        from src import resources
+
+        gmail = use_fake_gmail(args.gmail_latency, args.gmail_error_rate)
+        worker = draft_worker.get_worker()
+        worker.threads = args.draft_workers
+        worker.start()
+        if not resources.run_warmup(warmup_steps()):
+            raise SystemExit(f"❌ Warmup failed: {resources.warmup_status()['error']}")
+        send = in_process_sender()
+
+    run_id = uuid.uuid4().hex[:8]
+    print(f"[load_test] {len(tickets)} tickets, run {run_id}, {'HTTP ' + args.url if args.url else 'in-process'}",
+          file=sys.stderr)
+
+    steps, max_rate = [], None
+    for rate in [float(r) for r in args.rates.split(",")]:
+        tag = f"lt-{run_id}-{rate:g}"
+        step = run_step(send, tickets, rate, args.duration, args.concurrency, tag)
+        if args.url:
+            ticket_ids = [f"{tag}-{i}" for i in range(step["sent"])]
+            step["draft_delivery"] = http_delivery_stats(args.url, ticket_ids, args.delivery_timeout)
+        else:
+            step["draft_delivery"] = delivery_stats(tag, args.delivery_timeout)
+        step["sustainable"] = sustainable(step, args.slo_ms, args.max_error_rate)
+        steps.append(step)
+
+        stages = "  ".join(
+            f"{name}: p50={s['p50_ms']:.1f} p99={s['p99_ms']:.1f}"
+            for name, s in step["stages"].items() if s["count"]
+        )
+        delivery = step["draft_delivery"]["latency"]
+        print(
+            f"{'✅' if step['sustainable'] else '❌'} {rate:g}/s -> {step['throughput']:.1f}/s "
+            f"errors={step['errors']}  {stages}"
+            + (f"  draft_delivery: p50={delivery['p50_ms']:.0f} p99={delivery['p99_ms']:.0f}" if delivery["count"] else "")
+        )
+        if not step["sustainable"]:
+            break
+        max_rate = rate
+
+    if not args.url:
+        draft_worker.get_worker().stop()
+        from src.journal import close_journal
+        close_journal()
+
+    report = {
+        "run_id": run_id,
+        "mode": "http" if args.url else "in_process",
+        "params": vars(args),
+        "max_sustainable_rate": max_rate,
+        "fake_gmail": gmail.get_stats() if gmail is not None else None,
+        "steps": steps
+    }
+    print(f"[load_test] max sustainable rate: {max_rate if max_rate is not None else 'none'} tickets/s",
+          file=sys.stderr)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# automation/run_automation.py
+#
+# Batch-process support tickets from a JSONL file:
+#   python -m automation.run_automation requests.jsonl --out results.jsonl
+# Each line is a SupportTicket (ticket_id, user_email, subject, message).
+
+import argparse
+import json
+import sys
+import time
+
+from src.ticket_schema import SupportTicket
+from src.ticket_pipeline import process_tickets, QUERY_BATCH_SIZE, FANOUT_WORKERS
+from automation.draft_worker import get_worker
+from src.journal import get_journal, close_journal
+
+
+def load_tickets(path: str):
+    tickets, rejected = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                tickets.append(SupportTicket(**json.loads(line)))
+            except Exception as e:
+                rejected.append({"line": line_no, "error": str(e)})
+    return tickets, rejected
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the RAG ticket automation over a JSONL backlog.")
+    parser.add_argument("path", nargs="?", default="requests.jsonl", help="JSONL file of tickets")
+    parser.add_argument("--out", help="write one result per line here (default: stdout)")
+    parser.add_argument("--batch-size", type=int, default=QUERY_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=FANOUT_WORKERS)
+    args = parser.parse_args(argv)
+
+    tickets, rejected = load_tickets(args.path)
+    for r in rejected:
+        print(f"[automation] skipped line {r['line']}: {r['error']}", file=sys.stderr)
+    print(f"[automation] processing {len(tickets)} tickets from {args.path}", file=sys.stderr)
+
+    worker = get_worker()
+    worker.start()
+    t0 = time.perf_counter()
+    results = process_tickets(tickets, batch_size=args.batch_size, workers=args.workers)
+    get_journal().flush()
+    elapsed = time.perf_counter() - t0
+
+    # Gmail drafts are delivered in the background; wait for them before exiting
+    print("[automation] waiting for Gmail draft delivery...", file=sys.stderr)
+    worker.drain()
+    worker.stop()
+    close_journal()
+    print(f"[automation] draft jobs: {worker.counts()}", file=sys.stderr)
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for r in results:
+            out.write(json.dumps(r) + "\n")
+    finally:
+        if args.out:
+            out.close()
+
+    failed = sum(1 for r in results if "error" in r)
+    print(
+        f"[automation] done: {len(results) - failed} ok, {failed} failed, "
+        f"{len(rejected)} skipped in {elapsed:.1f}s",
+        file=sys.stderr
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
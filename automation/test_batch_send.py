@@ -0,0 +1,27 @@
+# automation/test_batch_send.py
+#
+# Offline check of send_drafts_batch against the in-process fake Gmail:
+# the batch connection drops after some drafts were already sent.
+#   python -m automation.test_batch_send
+
+from automation.gmail_service import use_fake_gmail
+from automation.gmail_send import send_drafts_batch
+
+gmail = use_fake_gmail(latency_seconds=0.0)
+draft_ids = [
+    gmail.handle("POST", "/gmail/v1/users/me/drafts", b'{"message": {}}')[1]["id"]
+    for _ in range(6)
+]
+
+# Gmail applies the first 2 sends, then the connection resets with no responses
+gmail.drop_next_batch_after = 2
+result = send_drafts_batch(draft_ids, chunk_size=10)
+
+print(result)
+assert set(result) == set(draft_ids), "every draft gets an outcome"
+assert not any("error" in r for r in result.values()), "nothing is reported failed"
+unconfirmed = [d for d, r in result.items() if r.get("unconfirmed")]
+assert unconfirmed == draft_ids[:2], "drafts gone after the drop count as sent"
+assert sorted(gmail.sent) == sorted(draft_ids), "each draft sent"
+assert len(gmail.sent) == len(set(gmail.sent)), "and sent exactly once"
+print("✅ partial batch failure: 2 reconciled as sent, 4 retried, no duplicates")
@@ -1,6 +1,12 @@
 # integration/decision_export.py
 
+import fcntl
 import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
@@ -8,9 +14,112 @@ EXPORT_DIR = Path("integration")
 EXPORT_DIR.mkdir(exist_ok=True)
 
 HISTORY_FILE = EXPORT_DIR / "decision_history.jsonl"
+# ticket_id -> byte offsets into HISTORY_FILE; derived data, rebuildable from the log
+INDEX_FILE = EXPORT_DIR / "decision_index.db"
 
+_write_lock = threading.Lock()
+_local = threading.local()
 
-def export_decision(
+
+@contextmanager
+def _locked_log():
+    """
+    Open the log for append under an exclusive flock, so a tell/write/index
+    sequence in one process never interleaves with another process's append.
+    _write_lock still serialises threads, which share the process's lock.
+    """
+    with _write_lock, open(HISTORY_FILE, "ab") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield f
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _get_index():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(str(INDEX_FILE), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS decision_offsets (
+                offset INTEGER PRIMARY KEY,
+                length INTEGER,
+                ticket_id TEXT
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_decision_ticket ON decision_offsets(ticket_id, offset)")
+        conn.execute("CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value INTEGER)")
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+
+def _indexed_bytes(conn) -> int:
+    row = conn.execute("SELECT value FROM index_meta WHERE key = 'indexed_bytes'").fetchone()
+    return row[0] if row else 0
+
+
+def _record_offsets(conn, entries, end):
+    """entries: [(offset, length, ticket_id)]; end: log size they cover up to."""
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO decision_offsets (offset, length, ticket_id) VALUES (?,?,?)",
+            entries
+        )
+        conn.execute(
+            "INSERT INTO index_meta (key, value) VALUES ('indexed_bytes', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)",
+            (end,)
+        )
+
+
+def _catch_up(conn):
+    """
+    Index whatever the log has beyond the indexed prefix (records appended
+    by another process, or by one that died between append and index).
+    """
+    if not HISTORY_FILE.exists():
+        return
+    start = _indexed_bytes(conn)
+    size = HISTORY_FILE.stat().st_size
+    if size < start:
+        # log was truncated or replaced: the index no longer describes it
+        with conn:
+            conn.execute("DELETE FROM decision_offsets")
+            conn.execute("DELETE FROM index_meta")
+        start = 0
+    if size <= start:
+        return
+
+    entries = []
+    end = start
+    with open(HISTORY_FILE, "rb") as f:
+        f.seek(start)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # torn tail of an in-progress append
+            try:
+                ticket_id = json.loads(line)["ticket_id"]
+            except (ValueError, KeyError):
+                ticket_id = None
+            entries.append((end, len(line), ticket_id))
+            end += len(line)
+    _record_offsets(conn, entries, end)
+
+
+def rebuild_index() -> int:
+    """Drop the offset index and rebuild it from the raw log."""
+    conn = _get_index()
+    with _locked_log():
+        with conn:
+            conn.execute("DELETE FROM decision_offsets")
+            conn.execute("DELETE FROM index_meta")
+        _catch_up(conn)
+    return conn.execute("SELECT COUNT(*) FROM decision_offsets").fetchone()[0]
+
+
+def make_decision_record(
     ticket_id: str,
     user_email: str,
     subject: str,
@@ -18,7 +127,7 @@ def export_decision(
     confidence: float,
     action: str
 ):
-    record = {
+    return {
         "ticket_id": ticket_id,
         "user_email": user_email,
         "subject": subject,
@@ -28,8 +137,75 @@ def export_decision(
         "timestamp": datetime.utcnow().isoformat()
     }
 
-    # ✅ append-only history
-    with open(HISTORY_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(record) + "\n")
+
+def export_decisions(records, fsync: bool = False):
+    """
+    Append many decision records with one write (+ one fsync when
+    requested) and index them in one transaction.
+    """
+    if not records:
+        return str(HISTORY_FILE)
+    # serialise (and read every ticket_id) before touching the file, so a bad record writes nothing
+    lines = [(json.dumps(r) + "\n").encode("utf-8") for r in records]
+    ticket_ids = [r["ticket_id"] for r in records]
+
+    # ✅ append-only history (+ offset index entries), all under the file lock
+    with _locked_log() as f:
+        f.seek(0, os.SEEK_END)
+        start = f.tell()
+        f.write(b"".join(lines))
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+        conn = _get_index()
+        if _indexed_bytes(conn) < start:
+            _catch_up(conn)
+        entries = []
+        offset = start
+        for ticket_id, line in zip(ticket_ids, lines):
+            entries.append((offset, len(line), ticket_id))
+            offset += len(line)
+        _record_offsets(conn, entries, offset)
 
     return str(HISTORY_FILE)
+
+
+def export_decision(
+    ticket_id: str,
+    user_email: str,
+    subject: str,
+    answer: str,
+    confidence: float,
+    action: str
+):
+    record = make_decision_record(ticket_id, user_email, subject, answer, confidence, action)
+    return export_decisions([record])
+
+
+def find_decisions(ticket_id: str):
+    """
+    All decisions for a ticket in log order, read by seeking to indexed offsets.
+    """
+    if not HISTORY_FILE.exists():
+        return []
+    conn = _get_index()
+    _catch_up(conn)
+    offsets = conn.execute(
+        "SELECT offset, length FROM decision_offsets WHERE ticket_id = ? ORDER BY offset",
+        (ticket_id,)
+    ).fetchall()
+
+    history = []
+    with open(HISTORY_FILE, "rb") as f:
+        for offset, length in offsets:
+            f.seek(offset)
+            history.append(json.loads(f.read(length)))
+    return history
+
+
+if __name__ == "__main__":
+    # python -m integration.decision_export rebuild-index
+    if sys.argv[1:] == ["rebuild-index"]:
+        print(f"✅ Indexed {rebuild_index()} decisions from {HISTORY_FILE}")
+    else:
+        print("usage: python -m integration.decision_export rebuild-index")
@@ -0,0 +1,164 @@
+# src/answer_cache.py
+"""
+Semantic cache for RAG answers.
+
+Stores recent query embeddings with the answer built for them; a new query
+whose embedding is within ANSWER_CACHE_THRESHOLD cosine similarity of a
+cached one reuses that answer instead of re-running retrieval.
+Entries expire after ANSWER_CACHE_TTL_SECONDS, the least recently used one
+is evicted when full, and everything is dropped when the index version
+(see chroma_retriever.index_version) changes.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", "2048"))  # 0 disables the cache
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "3600"))
+# how often to stat the index version marker
+VERSION_CHECK_SECONDS = 1.0
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype="float32")
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class SemanticCache:
+
+    def __init__(self, capacity=ANSWER_CACHE_SIZE, threshold=ANSWER_CACHE_THRESHOLD,
+                 ttl_seconds=ANSWER_CACHE_TTL_SECONDS, version_fn=None):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.version_fn = version_fn
+        self._lock = threading.Lock()
+        self._vectors = None                 # (capacity, dim), unit-normalized
+        self._expires = np.zeros(capacity)   # 0 = free slot
+        self._top_k = np.zeros(capacity, dtype="int64")
+        self._entries = {}                   # slot -> (top_k, result)
+        self._lru = OrderedDict()            # slot -> None, oldest first
+        self._version = None
+        self._version_checked = 0.0
+        self.stats = {"hits": 0, "misses": 0, "inserts": 0, "evictions": 0,
+                      "expirations": 0, "invalidations": 0}
+
+    # ----------------------------
+    # Invalidation
+    # ----------------------------
+    def _clear(self):
+        self._expires[:] = 0
+        self._entries.clear()
+        self._lru.clear()
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+            self.stats["invalidations"] += 1
+
+    def _check_version(self, now):
+        if self.version_fn is None or now - self._version_checked < VERSION_CHECK_SECONDS:
+            return
+        self._version_checked = now
+        version = self.version_fn()
+        if self._version is not None and version != self._version and self._entries:
+            print("[answer_cache] index changed, dropping cached answers")
+            self._clear()
+            self.stats["invalidations"] += 1
+        self._version = version
+
+    # ----------------------------
+    # Lookup / insert
+    # ----------------------------
+    def lookup(self, embeddings, top_k):
+        """
+        embeddings: (n, dim). Returns a list of cached results (None on miss).
+        """
+        embeddings = _normalize(embeddings)
+        results = [None] * len(embeddings)
+        with self._lock:
+            now = time.time()
+            self._check_version(now)
+            if self._entries:
+                expired = np.flatnonzero((self._expires > 0) & (self._expires <= now))
+                for slot in expired:
+                    self._free(int(slot))
+                    self.stats["expirations"] += 1
+
+            if self._entries:
+                sims = embeddings @ self._vectors.T           # (n, capacity)
+                # only entries built for the same top_k can answer this lookup
+                sims[:, (self._expires == 0) | (self._top_k != top_k)] = -1.0
+                best = sims.argmax(axis=1)
+                for i, slot in enumerate(best):
+                    slot = int(slot)
+                    if sims[i, slot] >= self.threshold:
+                        results[i] = self._entries[slot][1]
+                        self._lru.move_to_end(slot)
+
+            hits = sum(r is not None for r in results)
+            self.stats["hits"] += hits
+            self.stats["misses"] += len(results) - hits
+        return results
+
+    def _free(self, slot):
+        self._expires[slot] = 0
+        self._entries.pop(slot, None)
+        self._lru.pop(slot, None)
+
+    def insert(self, embeddings, top_k, results):
+        embeddings = _normalize(embeddings)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, embeddings.shape[1]), dtype="float32")
+            now = time.time()
+            for vector, result in zip(embeddings, results):
+                free = np.flatnonzero(self._expires == 0)
+                if len(free):
+                    slot = int(free[0])
+                else:
+                    slot, _ = self._lru.popitem(last=False)
+                    self._free(slot)
+                    self.stats["evictions"] += 1
+                self._vectors[slot] = vector
+                self._expires[slot] = now + self.ttl_seconds
+                self._top_k[slot] = top_k
+                self._entries[slot] = (top_k, result)
+                self._lru[slot] = None
+                self.stats["inserts"] += 1
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0
+            }
+
+
+def dedupe_queries(embeddings, threshold=ANSWER_CACHE_THRESHOLD):
+    """
+    Greedy near-duplicate grouping within one batch.
+    Returns leader[i]: index of the first earlier query i can reuse (or i).
+    """
+    embeddings = _normalize(embeddings)
+    sims = embeddings @ embeddings.T
+    leader = list(range(len(embeddings)))
+    leaders = []
+    for i in range(len(embeddings)):
+        if leaders:
+            j = leaders[int(sims[i, leaders].argmax())]
+            if sims[i, j] >= threshold:
+                leader[i] = j
+                continue
+        leaders.append(i)
+    return leader
@@ -4,12 +4,21 @@ from pydantic import BaseModel
 import traceback
 import threading
 import importlib
+import os
+
+from src.metrics import stage
+from src.observability import router as observability_router
 
 app = FastAPI(title="RAG PoC - Index Retrieval (lazy init, package-safe)")
+app.include_router(observability_router)
 
 _singletons = {}
 _singleton_lock = threading.Lock()
 
+# "faiss" | "sklearn" | "hnsw"; unset = first importable, in that order
+INDEX_BACKEND = os.environ.get("INDEX_BACKEND", "").strip().lower()
+BACKEND_CANDIDATES = (f"index_{INDEX_BACKEND}",) if INDEX_BACKEND else ("index_faiss", "index_sklearn", "index_hnsw")
+
 def ensure_module(module_name: str):
     """
     Import a module using full package path (src.<module>) if available,
@@ -28,8 +37,8 @@ def get_embedding_model():
         if "emb_model" in _singletons:
             return _singletons["emb_model"]
         mod = ensure_module("embeddings")
-        EmbeddingModel = getattr(mod, "EmbeddingModel")
-        _singletons["emb_model"] = EmbeddingModel()
+        # shared with the index backends: one set of weights per process
+        _singletons["emb_model"] = mod.get_embedding_model()
         return _singletons["emb_model"]
 
 def get_search_fn():
@@ -38,7 +47,7 @@ def get_search_fn():
     with _singleton_lock:
         if "search_fn" in _singletons:
             return _singletons["search_fn"]
-        for candidate in ("index_faiss", "index_sklearn", "index_hnsw"):
+        for candidate in BACKEND_CANDIDATES:
             try:
                 mod = ensure_module(candidate)
                 if hasattr(mod, "search"):
@@ -47,7 +56,14 @@ def get_search_fn():
                     return _singletons["search_fn"]
             except ModuleNotFoundError:
                 continue
-        raise RuntimeError("No index backend available. Ensure index_faiss.py or index_sklearn.py exists in src/")
+        raise RuntimeError(f"No index backend available (tried {', '.join(BACKEND_CANDIDATES)}; set INDEX_BACKEND)")
+
+def get_backend_module():
+    """Module that provided the active search function (None before first use)."""
+    search_fn = _singletons.get("search_fn")
+    if search_fn is None:
+        return None
+    return importlib.import_module(search_fn.__module__)
 
 class QueryRequest(BaseModel):
     query: str
@@ -58,7 +74,8 @@ def query(req: QueryRequest):
     try:
         _ = get_embedding_model()    # ensure model loaded if needed
         search_fn = get_search_fn()
-        results = search_fn(req.query, top_k=req.top_k)
+        with stage("index_search"):
+            results = search_fn(req.query, top_k=req.top_k)
         return {"query": req.query, "results": results}
     except Exception as e:
         traceback.print_exc()
@@ -71,7 +88,7 @@ def rebuild():
         if build_fn is not None:
             build_fn("sample_docs")
             return {"status": "ok", "message": "index rebuilt via backend build_index"}
-        for candidate in ("index_faiss", "index_sklearn", "index_hnsw"):
+        for candidate in BACKEND_CANDIDATES:
             try:
                 mod = ensure_module(candidate)
                 if hasattr(mod, "build_index"):
@@ -83,3 +100,21 @@ def rebuild():
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/index_stats")
+def index_stats():
+    try:
+        get_search_fn()
+        mod = get_backend_module()
+        stats_fn = getattr(mod, "get_stats", None)
+        from src.embeddings import get_cache_stats  # backend import already loaded it
+        from src.embed_batcher import get_batcher_stats
+        return {
+            "backend": mod.__name__,
+            "stats": stats_fn() if stats_fn is not None else {},
+            "embedding_cache": get_cache_stats(),
+            "embedding_batchers": get_batcher_stats()
+        }
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,32 +1,99 @@
 # src/app_sklearn.py
 
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+import os
+import threading
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 import traceback
-import json
-from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
 
 from src.ticket_schema import SupportTicket
-from src.rag_generate import generate_answer
-from src.automation_rules import decide_action
-from src.logger import log_ticket
+from src.ticket_pipeline import process_ticket as run_ticket, process_tickets as run_tickets
+from src.logger import log_ticket, ticket_stats
+from src.rag_generate import get_cache_stats
+from src.embed_batcher import get_batcher_stats
+from src.chroma_retriever import warmup_steps
+from src import resources
+from src.metrics import stage
+from src.observability import router as observability_router
 from src.draft_store import (
     save_draft,
     load_draft,
-    list_pending_approvals
+    load_drafts,
+    update_statuses,
+    list_drafts,
+    count_drafts,
+    PENDING_STATUSES
 )
-from integration.decision_export import export_decision
+from integration.decision_export import find_decisions, HISTORY_FILE as DECISION_HISTORY_FILE
 
-# REAL GMAIL INTEGRATION
-from automation.gmail_draft import create_draft
-from automation.gmail_send import send_draft
+# REAL GMAIL INTEGRATION (gmail_send is imported on first approval)
+from automation.draft_worker import get_worker
+from src.journal import close_journal
 
 
 app = FastAPI(title="RAG PoC - sklearn Retrieval")
+app.include_router(observability_router)
+
+# warm the retrieval stack in the background at startup; /readyz flips when done
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "1") != "0"
+_startup = {"import_seconds": round(time.perf_counter() - _IMPORT_STARTED, 3), "import_to_ready_seconds": None}
+
+
+def warmup():
+    if resources.run_warmup(warmup_steps()):
+        _startup["import_to_ready_seconds"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+        print(
+            f"[startup] ready: import {_startup['import_seconds']}s, "
+            f"import-to-ready {_startup['import_to_ready_seconds']}s"
+        )
+
 
-DECISION_HISTORY_FILE = Path("integration/decision_history.jsonl")
+@app.on_event("startup")
+def start_draft_worker():
+    get_worker().start()
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=warmup, name="warmup", daemon=True).start()
 
 
+@app.on_event("shutdown")
+def stop_draft_worker():
+    get_worker().stop()
+    # commit anything still queued for the group-commit journal
+    close_journal()
+
+# ----------------------------
+# Health
+# ----------------------------
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: warmup finished and the retrieval resources are loaded."""
+    body = {
+        "status": "ready" if resources.is_ready() else "not_ready",
+        "warmup": resources.warmup_status(),
+        "resources": resources.status(),
+        **_startup
+    }
+    return JSONResponse(body, status_code=200 if resources.is_ready() else 503)
+
+
+@app.post("/warmup")
+def run_warmup():
+    """Re-run warmup on demand, e.g. after building the index."""
+    warmup()
+    return readyz()
+
 # ----------------------------
 # API Models
 # ----------------------------
@@ -39,79 +106,48 @@ class OverrideRequest(BaseModel):
     new_action: str  # SAVE_DRAFT | ESCALATE
 
 
+class BulkApprovalRequest(BaseModel):
+    ticket_ids: List[str]
+
+
+class RetryDeliveryRequest(BaseModel):
+    ticket_ids: Optional[List[str]] = None  # None = every FAILED job
+
+
+class BatchTicketRequest(BaseModel):
+    tickets: List[SupportTicket]
+
+
 # ----------------------------
 # Core Endpoint
 # ----------------------------
 @app.post("/process_ticket")
 def process_ticket(ticket: SupportTicket):
     try:
-        # 1️⃣ Build RAG query
-        full_query = f"Subject: {ticket.subject}\nMessage: {ticket.message}"
-
-        rag_output = generate_answer(full_query)
-        answer = rag_output["answer"]
-        confidence = rag_output["confidence"]
-
-        # 2️⃣ Decide action
-        action = decide_action(confidence)
-
-        # 3️⃣ Log decision
-        log_ticket(
-            ticket_id=ticket.ticket_id,
-            email=ticket.user_email,
-            confidence=confidence,
-            action=action,
-            answer=answer
-        )
-
-        # 4️⃣ Export decision
-        if action in ["SAVE_DRAFT", "PENDING_APPROVAL"]:
-            export_decision(
-                ticket_id=ticket.ticket_id,
-                user_email=ticket.user_email,
-                subject=ticket.subject,
-                answer=answer,
-                confidence=confidence,
-                action=action
-            )
-
-        draft_result = None
-        gmail_draft_id = None
+        with stage("process_ticket"):
+            return run_ticket(ticket)
 
-        # 5️⃣ Create Gmail Draft AND persist ID
-        if action in ["SAVE_DRAFT", "PENDING_APPROVAL"]:
-            gmail_draft = create_draft(
-                to_email=ticket.user_email,
-                subject=f"Re: {ticket.subject}",
-                body=answer
-            )
-
-            gmail_draft_id = gmail_draft["draft_id"]
-
-            draft_result = save_draft(
-                ticket_id=ticket.ticket_id,
-                email=ticket.user_email,
-                body=answer,
-                confidence=confidence,
-                status="PENDING_APPROVAL",
-                gmail_draft_id=gmail_draft_id  # ✅ REQUIRED
-            )
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return {
-            "ticket_id": ticket.ticket_id,
-            "user_email": ticket.user_email,
-            "draft_reply": answer,
-            "confidence": confidence,
-            "action": action,
-            "draft_saved": draft_result,
-            "gmail_draft_id": gmail_draft_id,
-            "contexts_used": rag_output["contexts"]
-        }
 
+@app.post("/process_tickets")
+def process_tickets(req: BatchTicketRequest):
+    try:
+        with stage("process_tickets"):
+            results = run_tickets(req.tickets)
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+    failed = sum(1 for r in results if "error" in r)
+    return {
+        "count": len(results),
+        "failed": failed,
+        "results": results
+    }
+
 
 # ----------------------------
 # Approval Endpoints
@@ -124,13 +160,19 @@ def approve_ticket(req: ApprovalRequest):
 
     gmail_draft_id = draft.get("gmail_draft_id")
     if not gmail_draft_id:
+        job = get_worker().job_status(req.ticket_id)
         raise HTTPException(
             status_code=400,
-            detail="No Gmail draft ID found for this ticket"
+            detail=(
+                f"Gmail draft not created yet (delivery {job['status']})"
+                if job else "No Gmail draft ID found for this ticket"
+            )
         )
 
     # ✅ ACTUAL SEND (ONLY HERE)
-    send_result = send_draft(gmail_draft_id)
+    from automation.gmail_send import send_draft
+    with stage("gmail_send_draft"):
+        send_result = send_draft(gmail_draft_id)
 
     save_draft(
         req.ticket_id,
@@ -148,6 +190,77 @@ def approve_ticket(req: ApprovalRequest):
     }
 
 
+@app.post("/approve_tickets")
+def approve_tickets(req: BulkApprovalRequest):
+    """
+    Bulk approve: sends all drafts through Gmail batch requests and
+    reports per-ticket success/failure.
+    """
+    ticket_ids = list(dict.fromkeys(req.ticket_ids))
+    results = {}
+    to_send = {}  # gmail_draft_id -> (ticket_id, draft)
+
+    drafts = load_drafts(ticket_ids)
+    for ticket_id in ticket_ids:
+        draft = drafts.get(ticket_id)
+        if not draft:
+            results[ticket_id] = {"status": "FAILED", "error": "Draft not found"}
+            continue
+        gmail_draft_id = draft.get("gmail_draft_id")
+        if not gmail_draft_id:
+            results[ticket_id] = {"status": "FAILED", "error": "No Gmail draft ID found for this ticket"}
+            continue
+        to_send[gmail_draft_id] = (ticket_id, draft)
+
+    sent = {}
+    service = None
+    if to_send:
+        try:
+            from automation.gmail_send import send_drafts_batch
+            from automation.gmail_service import get_gmail_service
+            service = get_gmail_service()
+        except Exception as e:
+            traceback.print_exc()
+            # no client (import, token.json, refresh): nothing was sent
+            sent = {gmail_draft_id: {"error": str(e)} for gmail_draft_id in to_send}
+
+    if service is not None:
+        try:
+            with stage("gmail_send_batch"):
+                sent = send_drafts_batch(list(to_send), service=service)
+        except Exception as e:
+            traceback.print_exc()
+            # may have failed mid-batch: Gmail could have sent any of them
+            sent = {gmail_draft_id: {"error": str(e), "unknown": True} for gmail_draft_id in to_send}
+
+    sent_ids = []
+    for gmail_draft_id, (ticket_id, draft) in to_send.items():
+        outcome = sent.get(gmail_draft_id, {"error": "No response from Gmail", "unknown": True})
+        if "error" in outcome:
+            # UNKNOWN tickets keep their status; check Gmail's Sent folder before re-approving
+            status = "UNKNOWN" if outcome.get("unknown") else "FAILED"
+            results[ticket_id] = {"status": status, "error": outcome["error"]}
+            continue
+
+        sent_ids.append(ticket_id)
+        results[ticket_id] = {
+            "status": "EMAIL_SENT",
+            "gmail_message_id": outcome["message_id"]
+        }
+
+    # one transaction for every status change
+    update_statuses(sent_ids, "SENT")
+
+    sent_count = sum(1 for r in results.values() if r["status"] == "EMAIL_SENT")
+    return {
+        "count": len(ticket_ids),
+        "sent": sent_count,
+        "unknown": sum(1 for r in results.values() if r["status"] == "UNKNOWN"),
+        "failed": sum(1 for r in results.values() if r["status"] == "FAILED"),
+        "results": [{"ticket_id": t, **results[t]} for t in ticket_ids]
+    }
+
+
 @app.post("/reject_ticket")
 def reject_ticket(req: ApprovalRequest):
     draft = load_draft(req.ticket_id)
@@ -173,14 +286,82 @@ def reject_ticket(req: ApprovalRequest):
 # Approval Queue
 # ----------------------------
 @app.get("/pending_approvals")
-def pending_approvals():
-    approvals = list_pending_approvals()
+def pending_approvals(limit: int = 100, offset: int = 0):
+    approvals = list_drafts(PENDING_STATUSES, limit=limit, offset=offset)
     return {
-        "count": len(approvals),
+        "count": count_drafts(PENDING_STATUSES),
+        "limit": limit,
+        "offset": offset,
         "items": approvals
     }
 
 
+@app.get("/drafts")
+def drafts(status: Optional[str] = None, limit: int = 100, offset: int = 0):
+    statuses = [s.strip().upper() for s in status.split(",")] if status else None
+    return {
+        "count": count_drafts(statuses),
+        "limit": limit,
+        "offset": offset,
+        "items": list_drafts(statuses, limit=limit, offset=offset)
+    }
+
+
+@app.get("/draft_delivery/{ticket_id}")
+def draft_delivery(ticket_id: str):
+    job = get_worker().job_status(ticket_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="No draft delivery job for this ticket")
+    return {"ticket_id": ticket_id, **job}
+
+
+@app.post("/draft_delivery/retry")
+def retry_draft_delivery(req: RetryDeliveryRequest):
+    """Re-queue FAILED Gmail draft deliveries with a fresh attempt budget."""
+    return {"requeued": get_worker().retry_failed(req.ticket_ids)}
+
+
+# ----------------------------
+# Ticket Analytics
+# ----------------------------
+@app.get("/stats")
+def stats(hours: int = 24, since: Optional[str] = None, until: Optional[str] = None):
+    """
+    Action counts, confidence distribution and per-hour volume.
+    Window is [since, until) (ISO timestamps) or the last `hours` hours;
+    read from hourly rollups, so it is aligned to whole hours.
+    """
+    now = datetime.utcnow()
+    until = _parse_timestamp("until", until) if until else now + timedelta(hours=1)
+    since = _parse_timestamp("since", since) if since else now - timedelta(hours=hours - 1)
+    since, until = since.isoformat(), until.isoformat()
+    if since[:13] >= until[:13]:
+        raise HTTPException(status_code=400, detail="since must be at least one hour before until")
+    return ticket_stats(since, until)
+
+
+def _parse_timestamp(name: str, value: str) -> datetime:
+    """ISO timestamp -> naive UTC datetime (log timestamps are naive UTC)."""
+    try:
+        ts = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} is not an ISO timestamp: {value!r}")
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+@app.get("/answer_cache_stats")
+def answer_cache_stats():
+    return get_cache_stats()
+
+
+@app.get("/embedding_stats")
+def embedding_stats():
+    """Micro-batching of query embeddings: batch-size and queue-wait histograms."""
+    return {"batchers": get_batcher_stats()}
+
+
 # ----------------------------
 # Decision Status
 # ----------------------------
@@ -189,12 +370,7 @@ def decision_status(ticket_id: str):
     if not DECISION_HISTORY_FILE.exists():
         raise HTTPException(status_code=404, detail="Decision history not found")
 
-    history = []
-    with open(DECISION_HISTORY_FILE, "r", encoding="utf-8") as f:
-        for line in f:
-            record = json.loads(line)
-            if record["ticket_id"] == ticket_id:
-                history.append(record)
+    history = find_decisions(ticket_id)
 
     if not history:
         raise HTTPException(status_code=404, detail="No decisions found for this ticket")
@@ -0,0 +1,79 @@
+# src/bench_embeddings.py
+#
+# Encoding throughput: PyTorch vs ONNX fp32 vs ONNX int8.
+#   python -m src.bench_embeddings --texts 2000
+# batch 1 ~ query encoding latency, batch 64 ~ index build throughput.
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+from src.embeddings import MODEL_NAME
+from src.onnx_embedder import OnnxEncoder
+
+DOCS_DIR = Path("knowledge_base/docs")
+CHUNK_SIZE = 500
+
+
+def load_texts(n, seed=0):
+    """Real chunks from the knowledge base when present, else synthetic sentences."""
+    chunks = []
+    for path in sorted(DOCS_DIR.glob("*.txt")):
+        text = path.read_text(encoding="utf-8")
+        chunks.extend(text[i:i + CHUNK_SIZE] for i in range(0, len(text), CHUNK_SIZE))
+        if len(chunks) >= n:
+            break
+    if not chunks:
+        rng = random.Random(seed)
+        words = "patient password reset refund order error report dose symptom portal login account".split()
+        chunks = [" ".join(rng.choice(words) for _ in range(rng.randint(5, 80))) for _ in range(n)]
+    return (chunks * (n // len(chunks) + 1))[:n]
+
+
+def bench(encode, texts, batch_size, repeats=3):
+    encode(texts[:batch_size])  # warm-up
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for start in range(0, len(texts), batch_size):
+            encode(texts[start:start + batch_size])
+        best = min(best, time.perf_counter() - t0)
+    return len(texts) / best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends.")
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--batch-sizes", default="1,64")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--skip-torch", action="store_true")
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts)
+    backends = {}
+    if not args.skip_torch:
+        from sentence_transformers import SentenceTransformer
+        st = SentenceTransformer(args.model, device="cpu")
+        backends["torch"] = lambda batch: st.encode(batch, batch_size=len(batch), show_progress_bar=False)
+    for label, quantized in (("onnx-fp32", False), ("onnx-int8", True)):
+        encoder = OnnxEncoder(args.model, quantized=quantized)
+        backends[label] = lambda batch, e=encoder: e.encode(batch, batch_size=len(batch))
+
+    results = []
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        n = min(len(texts), 200) if batch_size == 1 else len(texts)
+        baseline = None
+        for label, encode in backends.items():
+            rate = bench(encode, texts[:n], batch_size)
+            baseline = baseline or rate
+            results.append({"backend": label, "batch_size": batch_size, "texts_per_sec": round(rate, 1),
+                            "speedup": round(rate / baseline, 2)})
+            print(f"batch={batch_size:<4} {label:<10} {rate:9.1f} texts/s  x{rate / baseline:.2f}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.out}")
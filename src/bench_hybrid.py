@@ -0,0 +1,109 @@
+# src/bench_hybrid.py
+#
+# Dense-only vs hybrid (BM25 + dense, RRF) vs hybrid with the lexical fast path.
+#   python -m src.bench_hybrid --samples 200 --top-k 5
+#   python -m src.bench_hybrid --queries my_queries.jsonl   # {"query": ..., "source_file": ...}
+# Without --queries, queries are sampled from the indexed chunks: an
+# identifier query (codes/numbers found in the chunk) and a phrase query
+# (a run of words from the chunk); a hit = the source chunk's file is in the top-k.
+
+import argparse
+import json
+import random
+import re
+import statistics
+import time
+
+from src.bm25_index import identifier_ratio
+from src.embeddings import clear_cache
+from src import chroma_retriever as retriever
+
+_CODE = re.compile(r"\b(?=[A-Za-z0-9\-_.]*\d)[A-Za-z0-9][A-Za-z0-9\-_.]{2,}\b")
+
+
+def sample_queries(n, seed=0, phrase_words=6):
+    index = retriever.bm25.get()
+    if index is None:
+        raise SystemExit("❌ No BM25 index; run python -m src.chroma_index first.")
+    rng = random.Random(seed)
+    live = index.live_docs()
+    picks = rng.sample(live, min(n, len(live)))
+    queries = []
+    for doc in picks:
+        text, source = index.texts[doc], index.metas[doc]["source_file"]
+        codes = _CODE.findall(text)
+        if codes:
+            queries.append({"query": " ".join(rng.sample(codes, min(2, len(codes)))),
+                            "source_file": source, "kind": "identifier"})
+        words = text.split()
+        if len(words) > phrase_words:
+            start = rng.randrange(len(words) - phrase_words)
+            queries.append({"query": " ".join(words[start:start + phrase_words]),
+                            "source_file": source, "kind": "phrase"})
+    return queries
+
+
+def run_mode(mode, queries, top_k):
+    latencies, hits = [], 0
+    for q in queries:
+        t0 = time.perf_counter()
+        if mode == "dense":
+            contexts = retriever.retrieve_contexts_batch([q["query"]], top_k=top_k, mode="dense")[0]
+        elif mode == "hybrid":
+            contexts = retriever.retrieve_contexts_batch([q["query"]], top_k=top_k, mode="hybrid")[0]
+        else:  # hybrid + lexical fast path
+            contexts = retriever.retrieve_context(q["query"], top_k=top_k, mode="hybrid")
+        latencies.append((time.perf_counter() - t0) * 1000)
+        hits += any(c["meta"].get("source_file") == q["source_file"] for c in contexts)
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "queries": len(queries),
+        f"hit_rate@{top_k}": round(hits / len(queries), 4) if queries else 0.0,
+        "p50_ms": round(statistics.median(latencies), 2) if latencies else 0.0,
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 2) if latencies else 0.0,
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dense vs hybrid retrieval.")
+    parser.add_argument("--queries", help="JSONL with query + source_file per line")
+    parser.add_argument("--samples", type=int, default=200, help="chunks to sample queries from")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [json.loads(line) for line in f if line.strip()]
+        for q in queries:
+            q.setdefault("kind", "identifier" if identifier_ratio(q["query"]) >= retriever.LEXICAL_FAST_PATH_RATIO else "phrase")
+    else:
+        queries = sample_queries(args.samples, args.seed)
+
+    # warm up model + indexes so the first mode is not charged for loading
+    retriever.retrieve_contexts_batch(["warmup"], top_k=args.top_k, mode="hybrid")
+
+    report = []
+    for kind in ("identifier", "phrase", "all"):
+        subset = [q for q in queries if kind == "all" or q["kind"] == kind]
+        if not subset:
+            continue
+        for mode in ("dense", "hybrid", "hybrid+fast_path"):
+            # cold embedding cache per mode: otherwise only the first mode pays for encoding
+            clear_cache()
+            row = {"kind": kind, **run_mode(mode, subset, args.top_k)}
+            report.append(row)
+            print(
+                f"{kind:<10} {mode:<17} n={row['queries']:<5} "
+                f"hit@{args.top_k}={row[f'hit_rate@{args.top_k}']:.3f} "
+                f"p50={row['p50_ms']:.2f}ms p95={row['p95_ms']:.2f}ms"
+            )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.out}")
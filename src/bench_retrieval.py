@@ -0,0 +1,393 @@
+# src/bench_retrieval.py
+#
+# Retrieval benchmark: every backend through one harness on the same vectors.
+#   python -m src.bench_retrieval --sizes 1000,10000,100000
+#   python -m src.bench_retrieval --sizes 1000000 --backends faiss-ivf,faiss-hnsw,hnswlib
+#   python -m src.bench_retrieval --corpus real --sizes 5000          # embeds sample_docs chunks
+#   python -m src.bench_retrieval --baseline bench_results/old.json  # print deltas vs a previous run
+#
+# Reports build time, index size on disk and in RAM (RSS delta), p50/p99
+# single-query latency, QPS at several concurrencies and recall@k against
+# exact brute force. Results go to bench_results/retrieval-<timestamp>.json.
+
+import argparse
+import gc
+import json
+import os
+import pickle
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+RESULTS_DIR = "bench_results"
+DIM = 384  # all-MiniLM-L6-v2
+N_CLUSTERS = 256
+CLUSTER_SPREAD = 1.0  # noise norm relative to the (unit) cluster centre
+QUERY_NOISE = 1.0
+
+
+# ----------------------------
+# Corpora
+# ----------------------------
+def _normalize(x):
+    x /= np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+    return x
+
+
+def random_corpus(n, dim=DIM, seed=0, chunk=100_000):
+    """Gaussian mixture on the unit sphere: clustered like real embeddings, so ANN recall is meaningful."""
+    rng = np.random.default_rng(seed)
+    centers = _normalize(rng.standard_normal((N_CLUSTERS, dim)).astype("float32"))
+    out = np.empty((n, dim), dtype="float32")
+    for start in range(0, n, chunk):
+        m = min(chunk, n - start)
+        labels = rng.integers(0, N_CLUSTERS, m)
+        noise = rng.standard_normal((m, dim)).astype("float32") * (CLUSTER_SPREAD / np.sqrt(dim))
+        out[start:start + m] = centers[labels] + noise
+    return _normalize(out)
+
+
+def real_corpus(n, folder="sample_docs"):
+    """Embeds up to n real chunks with the shared model (slow; meant for <= ~50k)."""
+    from src.ingest import iter_chunks
+    from src.embeddings import get_embedding_model
+
+    model = get_embedding_model()
+    texts = []
+    for text, _ in iter_chunks(folder):
+        texts.append(text)
+        if len(texts) >= n:
+            break
+    if not texts:
+        raise SystemExit(f"❌ No chunks found in {folder}")
+    return _normalize(model.embed(texts, cache=False).astype("float32"))
+
+
+def make_queries(corpus, n_queries, seed=1):
+    """Perturbed corpus vectors: near real data but not exact duplicates."""
+    rng = np.random.default_rng(seed)
+    base = corpus[rng.integers(0, len(corpus), n_queries)]
+    noise = rng.standard_normal(base.shape).astype("float32") * QUERY_NOISE / np.sqrt(corpus.shape[1])
+    return _normalize(base + noise)
+
+
+def exact_topk(corpus, queries, k, block=1024):
+    out = np.empty((len(queries), k), dtype="int64")
+    for start in range(0, len(queries), block):
+        sims = queries[start:start + block] @ corpus.T
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(sims, top, axis=1).argsort(axis=1)[:, ::-1]
+        out[start:start + block] = np.take_along_axis(top, order, axis=1)
+    return out
+
+
+# ----------------------------
+# Backends: the shipped index classes, pointed at a scratch directory
+# ----------------------------
+class _VectorModel:
+    """Embedding-model stand-in: bench "queries" are already vectors, so embed() passes them through."""
+
+    def embed(self, texts, cache=True):
+        return np.asarray(texts, dtype="float32")
+
+
+def _bench_metas(n):
+    return [{"filename": "bench", "chunk_index": i, "text": ""} for i in range(n)]
+
+
+class _ResidentBackend:
+    """search() goes through the real class: version check, locks, result dicts, stats."""
+
+    def search(self, queries, k):
+        return [[r["meta"]["chunk_index"] for r in self.index.search(q, top_k=k)] for q in queries]
+
+    def _paths(self, workdir, index_file):
+        return {
+            "index_path": os.path.join(workdir, index_file),
+            "meta_path": os.path.join(workdir, "meta.pkl"),
+            "version_path": os.path.join(workdir, "index.version"),
+        }
+
+
+class SklearnBackend(_ResidentBackend):
+    name = "sklearn"
+
+    def build(self, vectors, workdir):
+        from sklearn.neighbors import NearestNeighbors
+        from src.index_sklearn import SklearnIndex
+        from src.resident_index import write_version_marker
+
+        paths = self._paths(workdir, "index.pkl")
+        # same fit + pickles as index_sklearn.build_index
+        nbrs = NearestNeighbors(metric="cosine", algorithm="auto", n_jobs=-1).fit(vectors)
+        with open(paths["index_path"], "wb") as f:
+            pickle.dump(nbrs, f)
+        with open(paths["meta_path"], "wb") as f:
+            pickle.dump(_bench_metas(len(vectors)), f)
+        write_version_marker(paths["version_path"])
+        del nbrs
+        self.index = SklearnIndex(model=_VectorModel(), **paths)
+        self.index.search(vectors[0], top_k=1)  # load it, as the first request would
+
+
+class FaissBackend(_ResidentBackend):
+
+    def __init__(self, index_type):
+        self.index_type = index_type
+        self.name = f"faiss-{index_type}"
+
+    def build(self, vectors, workdir):
+        import faiss
+        from src.index_faiss import FaissIndex, _make_index
+        from src.resident_index import write_version_marker
+
+        paths = self._paths(workdir, "index.bin")
+        # same construction as index_faiss.build_index (vectors are already unit length)
+        index = _make_index(self.index_type, vectors.shape[1], len(vectors))
+        if not index.is_trained:
+            n_train = min(len(vectors), max(index.nlist * 256, 10000))
+            sample = vectors[np.random.default_rng(0).choice(len(vectors), n_train, replace=False)]
+            index.train(sample)
+        index.add(vectors)
+        faiss.write_index(index, paths["index_path"])
+        with open(paths["meta_path"], "wb") as f:
+            pickle.dump(_bench_metas(len(vectors)), f)
+        write_version_marker(paths["version_path"])
+        del index
+        # reloaded (memory-mapped where possible) by FaissIndex, with its search params
+        self.index = FaissIndex(model=_VectorModel(), **paths)
+        self.index.search(vectors[0], top_k=1)
+
+
+class HnswlibBackend(_ResidentBackend):
+    name = "hnswlib"
+
+    def build(self, vectors, workdir):
+        from src.index_hnsw import HnswIndex
+
+        self.index = HnswIndex(model=_VectorModel(), **self._paths(workdir, "index.bin"))
+        self.index.build(vectors, _bench_metas(len(vectors)))
+
+
+class ChromaBackend:
+    name = "chroma"
+
+    def build(self, vectors, workdir):
+        import chromadb
+        from src.chroma_retriever import COLLECTION_NAME
+
+        self.client = chromadb.PersistentClient(path=workdir)
+        self.collection = self.client.create_collection(COLLECTION_NAME, embedding_function=None)
+        step = self.client.get_max_batch_size()
+        for start in range(0, len(vectors), step):
+            end = min(start + step, len(vectors))
+            self.collection.add(
+                ids=[str(i) for i in range(start, end)],
+                embeddings=vectors[start:end],
+                metadatas=[{"chunk_index": i} for i in range(start, end)]
+            )
+
+    def search(self, queries, k):
+        from src.chroma_retriever import retrieve_contexts_batch
+
+        # the dense retrieval path the app uses, on the bench collection
+        rows = retrieve_contexts_batch(
+            [""] * len(queries), top_k=k, query_embeddings=queries, mode="dense", collection=self.collection
+        )
+        return [[c["meta"]["chunk_index"] for c in row] for row in rows]
+
+
+BACKENDS = {
+    "sklearn": SklearnBackend,
+    "faiss-flat": lambda: FaissBackend("flat"),
+    "faiss-ivf": lambda: FaissBackend("ivf"),
+    "faiss-hnsw": lambda: FaissBackend("hnsw"),
+    "hnswlib": HnswlibBackend,
+    "chroma": ChromaBackend,
+}
+
+
+# ----------------------------
+# Measurements
+# ----------------------------
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _release_memory():
+    """gc + hand freed heap back to the OS so the next RSS delta is not hidden by reuse."""
+    gc.collect()
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _dir_bytes(path):
+    return sum(
+        os.path.getsize(os.path.join(root, f))
+        for root, _, files in os.walk(path) for f in files
+    )
+
+
+def _latencies(backend, queries, k):
+    times = []
+    for q in queries:
+        t0 = time.perf_counter()
+        backend.search(q[None, :], k)
+        times.append((time.perf_counter() - t0) * 1000)
+    return np.array(times)
+
+
+def _qps(backend, queries, k, concurrency, min_seconds=1.0):
+    def worker(offset):
+        done = 0
+        i = offset
+        while time.perf_counter() < deadline:
+            backend.search(queries[i % len(queries)][None, :], k)
+            i += concurrency
+            done += 1
+        return done
+
+    deadline = time.perf_counter() + min_seconds
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        total = sum(pool.map(worker, range(concurrency)))
+    return total / (time.perf_counter() - t0)
+
+
+def run_backend(name, vectors, queries, truth, k, concurrencies):
+    # build a throwaway index first so library imports / client start-up are not charged to RAM
+    warm_dir = tempfile.mkdtemp(prefix=f"bench-{name}-warm-")
+    try:
+        BACKENDS[name]().build(vectors[:256], warm_dir)
+    finally:
+        shutil.rmtree(warm_dir, ignore_errors=True)
+
+    backend = BACKENDS[name]()
+    workdir = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    try:
+        _release_memory()
+        rss0 = _rss_bytes()
+        t0 = time.perf_counter()
+        backend.build(vectors, workdir)
+        build_seconds = time.perf_counter() - t0
+        _release_memory()
+        ram_bytes = max(0, _rss_bytes() - rss0)
+
+        # recall through the same single-query path that is timed below
+        found = [backend.search(q[None, :], k)[0] for q in queries]
+        recall = float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+        lat = _latencies(backend, queries, k)
+        return {
+            "backend": backend.name,
+            "build_seconds": round(build_seconds, 3),
+            "disk_bytes": _dir_bytes(workdir),
+            "ram_bytes": ram_bytes,
+            "p50_ms": round(float(np.percentile(lat, 50)), 3),
+            "p99_ms": round(float(np.percentile(lat, 99)), 3),
+            "qps": {str(c): round(_qps(backend, queries, k, c), 1) for c in concurrencies},
+            f"recall_at_{k}": round(recall, 4)
+        }
+    finally:
+        del backend
+        _release_memory()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline_path):
+    """Print metric deltas against a previous results file (matched on backend + corpus size)."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["backend"], r["n"]): r for r in json.load(f)["results"]}
+    for row in report["results"]:
+        old = baseline.get((row["backend"], row["n"]))
+        if old is None:
+            continue
+        deltas = []
+        for key in ("build_seconds", "p50_ms", "p99_ms", f"recall_at_{report['meta']['k']}"):
+            if key in old and old[key]:
+                deltas.append(f"{key} {100.0 * (row[key] - old[key]) / old[key]:+.1f}%")
+        print(f"Δ {row['backend']:<11} n={row['n']:<8} " + "  ".join(deltas))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark retrieval backends on synthetic corpora.")
+    parser.add_argument("--sizes", default="1000,10000", help="corpus sizes, e.g. 1000,100000,1000000")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--corpus", choices=["random", "real"], default="random")
+    parser.add_argument("--docs", default="sample_docs", help="folder for --corpus real")
+    parser.add_argument("--dim", type=int, default=DIM)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--out", help=f"results file (default {RESULTS_DIR}/retrieval-<timestamp>.json)")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    args = parser.parse_args()
+
+    concurrencies = [int(c) for c in args.concurrency.split(",")]
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "corpus": args.corpus,
+            "dim": args.dim,
+            "queries": args.queries,
+            "k": args.top_k,
+            "concurrency": concurrencies
+        },
+        "results": []
+    }
+
+    for n in [int(s) for s in args.sizes.split(",")]:
+        t0 = time.perf_counter()
+        vectors = random_corpus(n, args.dim) if args.corpus == "random" else real_corpus(n, args.docs)
+        queries = make_queries(vectors, args.queries)
+        truth = exact_topk(vectors, queries, args.top_k)
+        print(f"📦 corpus n={len(vectors)} dim={vectors.shape[1]} ready in {time.perf_counter() - t0:.1f}s")
+
+        for name in args.backends.split(","):
+            try:
+                row = run_backend(name, vectors, queries, truth, args.top_k, concurrencies)
+            except ImportError as e:
+                print(f"⚠️  {name}: skipped ({e})")
+                continue
+            row = {"n": len(vectors), **row}
+            report["results"].append(row)
+            print(
+                f"{row['backend']:<11} n={row['n']:<8} build={row['build_seconds']:.2f}s "
+                f"disk={row['disk_bytes'] / 2**20:.1f}MB ram={row['ram_bytes'] / 2**20:.1f}MB "
+                f"p50={row['p50_ms']:.2f}ms p99={row['p99_ms']:.2f}ms "
+                f"qps={row['qps']} recall@{args.top_k}={row[f'recall_at_{args.top_k}']:.3f}"
+            )
+
+    out = args.out or os.path.join(RESULTS_DIR, f"retrieval-{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {out}")
+
+    if args.baseline:
+        compare(report, args.baseline)
@@ -0,0 +1,202 @@
+# src/bm25_index.py
+"""
+Lexical (BM25) inverted index over the same chunks as the Chroma collection.
+Built by chroma_index.py next to the vector index; queried by
+chroma_retriever for hybrid and lexical-only retrieval.
+"""
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# "ERR-4021", "v2.3.1", "reset_password" stay whole; their parts are indexed too
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+_PART = re.compile(r"[a-z0-9]+")
+_IDENTIFIER = re.compile(r"^(?=.*\d)[A-Za-z0-9][A-Za-z0-9\-_.]*$|^[A-Za-z0-9]+(?:[-_.][A-Za-z0-9]+)+$|^[A-Z0-9]{2,}$")
+
+
+def tokenize(text: str):
+    tokens = []
+    for tok in _TOKEN.findall(text.lower()):
+        tokens.append(tok)
+        parts = _PART.findall(tok)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def identifier_ratio(text: str) -> float:
+    """Share of words that look like codes/ids (contain digits, joiners, or are ALL-CAPS)."""
+    words = [w.strip(".,;:!?()[]{}\"'") for w in text.split()]
+    words = [w for w in words if w]
+    if not words:
+        return 0.0
+    return sum(1 for w in words if _IDENTIFIER.match(w)) / len(words)
+
+
+class BM25Index:
+
+    def __init__(self):
+        self.ids = []
+        self.texts = []
+        self.metas = []
+        self.doc_len = None
+        self.avgdl = 0.0
+        self.postings = {}  # term -> (doc indexes int32, term freqs float32)
+        self.idf = {}
+        self.free = []  # doc slots emptied by update(), reused by later adds
+
+    @classmethod
+    def build(cls, chunks):
+        """chunks: iterable of (chunk_id, text, meta)."""
+        index = cls()
+        postings = defaultdict(lambda: ([], []))
+        lengths = []
+        for doc, (chunk_id, text, meta) in enumerate(chunks):
+            index.ids.append(chunk_id)
+            index.texts.append(text)
+            index.metas.append(meta)
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                docs, tfs = postings[term]
+                docs.append(doc)
+                tfs.append(tf)
+
+        n = len(index.ids)
+        index.doc_len = np.asarray(lengths, dtype="float32")
+        index.avgdl = float(index.doc_len.mean()) if n else 0.0
+        for term, (docs, tfs) in postings.items():
+            index.postings[term] = (np.asarray(docs, dtype="int32"), np.asarray(tfs, dtype="float32"))
+            df = len(docs)
+            index.idf[term] = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+        return index
+
+    def __len__(self):
+        return len(self.ids) - len(self.free)
+
+    def live_docs(self):
+        return [doc for doc, chunk_id in enumerate(self.ids) if chunk_id is not None]
+
+    def update(self, remove_ids, chunks):
+        """
+        Drop chunks by id and add (or replace) chunks (chunk_id, text, meta).
+        Only the postings of terms occurring in the dropped/added chunks are
+        rewritten; emptied doc slots are reused. idf is recomputed from the
+        stored document frequencies (no re-tokenizing of untouched chunks).
+        """
+        chunks = list(chunks)
+        slots = {chunk_id: doc for doc, chunk_id in enumerate(self.ids) if chunk_id is not None}
+        dropped = defaultdict(list)  # term -> doc slots to remove from its postings
+        for chunk_id in set(remove_ids) | {chunk_id for chunk_id, _, _ in chunks}:
+            doc = slots.pop(chunk_id, None)
+            if doc is None:
+                continue
+            for term in set(tokenize(self.texts[doc])):
+                dropped[term].append(doc)
+            self.ids[doc], self.texts[doc], self.metas[doc] = None, "", None
+            self.doc_len[doc] = 0.0
+            self.free.append(doc)
+
+        added = defaultdict(lambda: ([], []))
+        lengths = list(self.doc_len)
+        self.free.sort(reverse=True)
+        for chunk_id, text, meta in chunks:
+            if self.free:
+                doc = self.free.pop()
+                self.ids[doc], self.texts[doc], self.metas[doc] = chunk_id, text, meta
+            else:
+                doc = len(self.ids)
+                self.ids.append(chunk_id)
+                self.texts.append(text)
+                self.metas.append(meta)
+                lengths.append(0.0)
+            counts = Counter(tokenize(text))
+            lengths[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                docs, tfs = added[term]
+                docs.append(doc)
+                tfs.append(tf)
+        self.doc_len = np.asarray(lengths, dtype="float32")
+
+        for term in set(dropped) | set(added):
+            docs, tfs = self.postings.get(term, (np.zeros(0, dtype="int32"), np.zeros(0, dtype="float32")))
+            if term in dropped:
+                keep = ~np.isin(docs, dropped[term])
+                docs, tfs = docs[keep], tfs[keep]
+            if term in added:
+                docs = np.concatenate([docs, np.asarray(added[term][0], dtype="int32")])
+                tfs = np.concatenate([tfs, np.asarray(added[term][1], dtype="float32")])
+            if len(docs):
+                self.postings[term] = (docs, tfs)
+            else:
+                self.postings.pop(term, None)
+                self.idf.pop(term, None)
+
+        n = len(self)
+        self.avgdl = float(self.doc_len.sum() / n) if n else 0.0
+        for term, (docs, _) in self.postings.items():
+            df = len(docs)
+            self.idf[term] = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+        return self
+
+    def search(self, query: str, top_k: int = 5):
+        """Return [(doc index, bm25 score)] best first; empty if no term matches."""
+        terms = [t for t in set(tokenize(query)) if t in self.postings]
+        if not terms or not self.ids:
+            return []
+        scores = np.zeros(len(self.ids), dtype="float32")
+        norm = K1 * (1.0 - B + B * self.doc_len / max(self.avgdl, 1e-9))
+        for term in terms:
+            docs, tfs = self.postings[term]
+            scores[docs] += self.idf[term] * tfs * (K1 + 1.0) / (tfs + norm[docs])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(i), float(scores[i])) for i in order]
+
+    def save(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path, "rb") as f:
+            index.__dict__.update(pickle.load(f))
+        return index
+
+
+class ResidentBM25:
+    """Loads the index once and reloads it when chroma_index.py rewrites the file."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._index = None
+        self._mtime = None
+
+    def get(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._index = BM25Index.load(self.path)
+                    self._mtime = mtime
+                    print(f"[bm25] loaded {len(self._index)} chunks from {self.path}")
+        return self._index
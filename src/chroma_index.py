@@ -2,8 +2,14 @@
 
 from pathlib import Path
 import chromadb
-from chromadb.utils import embedding_functions
+import hashlib
+import json
 import os
+import pickle
+import sys
+
+from src.bm25_index import BM25Index
+from src.embeddings import chroma_embedding_function, embedding_id
 
 print("🔎 CWD:", os.getcwd())
 
@@ -12,6 +18,10 @@ print("🔎 CWD:", os.getcwd())
 # ----------------------------
 DOCS_DIR = Path("knowledge_base/docs").resolve()
 CHROMA_DIR = Path("chroma_db").resolve()
+# per-file content hashes + chunk ids of what is currently in the collection
+MANIFEST_PATH = CHROMA_DIR / "index_manifest.json"
+# lexical index over the same chunks (see src/bm25_index.py)
+BM25_PATH = CHROMA_DIR / "bm25_index.pkl"
 
 # ----------------------------
 # Constants
@@ -19,9 +29,111 @@ CHROMA_DIR = Path("chroma_db").resolve()
 CHUNK_SIZE = 500
 COLLECTION_NAME = "knowledge_base"
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# model + inference backend (torch / onnx-int8); switching it forces a full re-embed
+EMBEDDING_ID = embedding_id(EMBEDDING_MODEL)
+# Chroma rejects very large add/upsert calls; stay well below its max batch size
+UPSERT_BATCH_SIZE = 1000
+# persist the manifest every N re-embedded files so a crashed run resumes there
+MANIFEST_CHECKPOINT_EVERY = 100
+# changed chunks held in memory for an incremental BM25 update; beyond this, rebuild it
+BM25_DELTA_MAX_CHUNKS = 20000
+
+
+# ----------------------------
+# Manifest helpers
+# ----------------------------
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _load_manifest() -> dict:
+    if not MANIFEST_PATH.exists():
+        return {"embedding_model": EMBEDDING_ID, "chunk_size": CHUNK_SIZE, "files": {}}
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest: dict):
+    tmp = MANIFEST_PATH.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, MANIFEST_PATH)
+
+
+def _chunk_file(file: Path):
+    text = file.read_text(encoding="utf-8").strip()
+    chunks = [
+        text[i:i + CHUNK_SIZE]
+        for i in range(0, len(text), CHUNK_SIZE)
+        if text[i:i + CHUNK_SIZE].strip()
+    ]
+
+    documents, metadatas, ids = [], [], []
+    for idx, chunk in enumerate(chunks):
+        documents.append(chunk)
+        metadatas.append({
+            "source_file": file.name,
+            "chunk_index": idx
+        })
+        ids.append(f"{file.stem}__chunk_{idx}")
+    return documents, metadatas, ids
+
+
+def _upsert_batched(collection, documents, metadatas, ids):
+    for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+        end = start + UPSERT_BATCH_SIZE
+        collection.upsert(
+            documents=documents[start:end],
+            metadatas=metadatas[start:end],
+            ids=ids[start:end]
+        )
+
 
+def build_bm25_index(files):
+    """Rebuild the BM25 index from the same chunks that went into Chroma (no embedding)."""
+    def chunks():
+        for file in files:
+            documents, metadatas, ids = _chunk_file(file)
+            yield from zip(ids, documents, metadatas)
 
-def build_chroma_index():
+    index = BM25Index.build(chunks())
+    index.save(BM25_PATH)
+    print(f"🔤 BM25 index: {len(index)} chunks, {len(index.postings)} terms")
+    return len(index)
+
+
+def update_bm25_index(files, manifest, remove_ids, chunks):
+    """
+    Apply one sync's changes to the existing BM25 index: only the chunks of
+    added/changed/removed files are tokenized. Falls back to a full rebuild
+    when there is no index yet or it does not match the manifest (e.g. an
+    earlier sync died after checkpointing the manifest).
+    """
+    try:
+        index = BM25Index.load(BM25_PATH)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return build_bm25_index(files)
+    index.update(remove_ids, chunks)
+    expected = {chunk_id for entry in manifest["files"].values() for chunk_id in entry["chunk_ids"]}
+    if {index.ids[doc] for doc in index.live_docs()} != expected:
+        print("🔤 BM25 index out of step with the manifest; rebuilding")
+        return build_bm25_index(files)
+    index.save(BM25_PATH)
+    print(f"🔤 BM25 index updated: -{len(remove_ids)} +{len(chunks)} chunks ({len(index)} total)")
+    return len(index)
+
+
+def build_chroma_index(full: bool = False):
+    """
+    Incrementally sync the collection with DOCS_DIR.
+    Only new/changed files (by content hash) are re-chunked and re-embedded;
+    chunks of deleted files, and surplus chunks of shrunk files, are removed.
+    full=True ignores the manifest and re-embeds everything.
+    """
     print("📁 Docs dir:", DOCS_DIR)
     print("📦 Chroma dir:", CHROMA_DIR)
 
@@ -32,51 +144,115 @@ def build_chroma_index():
         path=str(CHROMA_DIR)
     )
 
-    embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=EMBEDDING_MODEL
-    )
+    embedding_fn = chroma_embedding_function(EMBEDDING_MODEL)
+
+    manifest = _load_manifest()
+    if (
+        full
+        or manifest.get("embedding_model") != EMBEDDING_ID
+        or manifest.get("chunk_size") != CHUNK_SIZE
+    ):
+        # vectors from another model/chunking cannot be mixed in: start over
+        try:
+            client.delete_collection(COLLECTION_NAME)
+        except Exception:
+            pass
+        manifest = {"embedding_model": EMBEDDING_ID, "chunk_size": CHUNK_SIZE, "files": {}}
 
     collection = client.get_or_create_collection(
         name=COLLECTION_NAME,
         embedding_function=embedding_fn
     )
 
-    documents, metadatas, ids = [], [], []
+    files = sorted(DOCS_DIR.glob("*.txt"))
+    print("📄 Files found:", len(files))
 
-    files = list(DOCS_DIR.glob("*.txt"))
-    print("📄 Files found:", [f.name for f in files])
+    known = manifest["files"]
+    rebuild_bm25 = not known or not BM25_PATH.exists()
+    bm25_removed, bm25_chunks = [], []
+    seen = set()
+    added = updated = unchanged = removed = 0
+    chunks_upserted = 0
 
     for file in files:
-        text = file.read_text(encoding="utf-8").strip()
-        if not text:
+        seen.add(file.name)
+        st = file.stat()
+        entry = known.get(file.name)
+
+        # cheap stat check first; only hash when size/mtime moved
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            unchanged += 1
             continue
 
-        chunks = [
-            text[i:i + CHUNK_SIZE]
-            for i in range(0, len(text), CHUNK_SIZE)
-            if text[i:i + CHUNK_SIZE].strip()
-        ]
-
-        for idx, chunk in enumerate(chunks):
-            documents.append(chunk)
-            metadatas.append({
-                "source_file": file.name,
-                "chunk_index": idx
-            })
-            ids.append(f"{file.stem}__chunk_{idx}")
-
-    if not documents:
+        digest = _file_sha256(file)
+        if entry and entry["sha256"] == digest:
+            entry["size"], entry["mtime_ns"] = st.st_size, st.st_mtime_ns
+            unchanged += 1
+            continue
+
+        documents, metadatas, ids = _chunk_file(file)
+        if documents:
+            _upsert_batched(collection, documents, metadatas, ids)
+            chunks_upserted += len(ids)
+
+        stale = set(entry["chunk_ids"]) - set(ids) if entry else set()
+        if stale:
+            collection.delete(ids=sorted(stale))
+        if not rebuild_bm25:
+            # only kept for the BM25 delta; a full rebuild re-reads the files instead
+            bm25_removed.extend(stale)
+            bm25_chunks.extend(zip(ids, documents, metadatas))
+            if len(bm25_chunks) > BM25_DELTA_MAX_CHUNKS:
+                # a delta this large is no cheaper than a rebuild: stop holding its text
+                rebuild_bm25 = True
+                bm25_removed, bm25_chunks = [], []
+
+        known[file.name] = {
+            "sha256": digest,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "chunk_ids": ids
+        }
+        if entry:
+            updated += 1
+        else:
+            added += 1
+        if (added + updated) % MANIFEST_CHECKPOINT_EVERY == 0:
+            _save_manifest(manifest)
+
+    for name in sorted(set(known) - seen):
+        chunk_ids = known.pop(name)["chunk_ids"]
+        if chunk_ids:
+            collection.delete(ids=chunk_ids)
+        if not rebuild_bm25:
+            bm25_removed.extend(chunk_ids)
+        removed += 1
+
+    _save_manifest(manifest)
+
+    if collection.count() == 0:
         raise RuntimeError("❌ No documents to index")
 
-    collection.add(
-        documents=documents,
-        metadatas=metadatas,
-        ids=ids
+    if rebuild_bm25:
+        build_bm25_index(files)
+    elif added or updated or removed:
+        update_bm25_index(files, manifest, bm25_removed, bm25_chunks)
+
+    print(
+        f"✅ Sync done: {added} added, {updated} updated, "
+        f"{unchanged} unchanged, {removed} removed ({chunks_upserted} chunks embedded)"
     )
+    print(f"📦 Chroma persisted at: {CHROMA_DIR} ({collection.count()} chunks)")
 
-    print(f"✅ Indexed {len(documents)} chunks")
-    print(f"📦 Chroma persisted at: {CHROMA_DIR}")
+    return {
+        "added": added,
+        "updated": updated,
+        "unchanged": unchanged,
+        "removed": removed,
+        "chunks_upserted": chunks_upserted,
+        "total_chunks": collection.count()
+    }
 
 
 if __name__ == "__main__":
-    build_chroma_index()
+    build_chroma_index(full="--full" in sys.argv[1:])
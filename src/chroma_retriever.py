@@ -1,57 +1,244 @@
 # src/chroma_retriever.py
 
 from pathlib import Path
-import chromadb
-from chromadb.utils import embedding_functions
+import os
+
+import numpy as np
+
+from src.bm25_index import ResidentBM25, identifier_ratio
+from src.embeddings import chroma_embedding_function, get_embedding_model
+from src import resources
+from src.metrics import stage
 
 CHROMA_DIR = Path("chroma_db").resolve()
 COLLECTION_NAME = "knowledge_base"
+# rewritten by chroma_index.py on every build; its mtime is the index version
+MANIFEST_PATH = CHROMA_DIR / "index_manifest.json"
+BM25_PATH = CHROMA_DIR / "bm25_index.pkl"
+
+# "dense" = vectors only; "hybrid" = dense + BM25 fused with reciprocal rank fusion
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "dense")
+RRF_K = 60
+# candidates taken from each retriever before fusion
+HYBRID_CANDIDATES = 20
+# queries with at least this share of code-like words skip the embedding entirely
+LEXICAL_FAST_PATH_RATIO = 0.5
+
 
-if not CHROMA_DIR.exists():
-    raise RuntimeError(
-        f"❌ Chroma DB not found at {CHROMA_DIR}. Run chroma_index.py first."
-    )
 
-embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="all-MiniLM-L6-v2"
-)
+# ----------------------------
+# Lazily built resources (nothing heavy happens at import)
+# ----------------------------
+def _load_embedding_fn():
+    return chroma_embedding_function("all-MiniLM-L6-v2")
 
-# ✅ MUST USE PersistentClient
-client = chromadb.PersistentClient(
-    path=str(CHROMA_DIR)
-)
 
-collection = client.get_collection(
-    name=COLLECTION_NAME,
-    embedding_function=embedding_fn
-)
+def _open_collection():
+    if not CHROMA_DIR.exists():
+        raise RuntimeError(
+            f"❌ Chroma DB not found at {CHROMA_DIR}. Run chroma_index.py first."
+        )
+    import chromadb
 
+    # ✅ MUST USE PersistentClient
+    client = chromadb.PersistentClient(
+        path=str(CHROMA_DIR)
+    )
 
-def retrieve_context(query: str, top_k: int = 5):
-    results = collection.query(
-        query_texts=[query],
-        n_results=top_k,
-        include=["documents", "metadatas", "distances"]
+    return client.get_collection(
+        name=COLLECTION_NAME,
+        embedding_function=embedding_fn_resource.get()
     )
 
+
+embedding_fn_resource = resources.register("chroma_embedding_fn", _load_embedding_fn)
+collection_resource = resources.register("chroma_collection", _open_collection)
+
+
+def get_collection():
+    return collection_resource.get()
+
+
+bm25 = ResidentBM25(BM25_PATH)
+
+
+def _to_contexts(results, row: int = 0):
     contexts = []
 
-    if not results or not results["documents"] or not results["documents"][0]:
+    if not results or not results["documents"] or not results["documents"][row]:
         return contexts
 
-    for i in range(len(results["documents"][0])):
-        distance = results["distances"][0][i]
+    for i in range(len(results["documents"][row])):
+        distance = results["distances"][row][i]
         similarity = round(max(0.0, 1.0 - distance), 3)
 
         contexts.append({
-            "text": results["documents"][0][i],
-            "meta": results["metadatas"][0][i],
+            "text": results["documents"][row][i],
+            "meta": results["metadatas"][row][i],
             "score": similarity
         })
 
     return contexts
 
 
+def _lexical_contexts(index, hits):
+    """
+    BM25-only contexts. There is no query embedding on this path, so "score"
+    (vector similarity everywhere else) is None; "lexical_score" is the
+    BM25 score relative to the best hit.
+    """
+    best = hits[0][1] if hits else 1.0
+    return [
+        {
+            "text": index.texts[doc],
+            "meta": index.metas[doc],
+            "score": None,
+            "lexical_score": round(score / best, 3),
+            "match": "lexical"
+        }
+        for doc, score in hits
+    ]
+
+
+def _fuse(results, row, index, hits, top_k):
+    """
+    Reciprocal rank fusion of one dense result row with BM25 hits.
+    Returns [(chunk_id, ctx)] ordered by "rrf_score"; chunks found only
+    by BM25 still need their vector "score" filled in (_fill_cosine).
+    """
+    fused = {}
+    for rank, (chunk_id, ctx) in enumerate(zip(results["ids"][row], _to_contexts(results, row))):
+        fused[chunk_id] = dict(ctx, match="dense", rrf_score=1.0 / (RRF_K + rank + 1))
+    for rank, ctx in enumerate(_lexical_contexts(index, hits)):
+        chunk_id = index.ids[hits[rank][0]]
+        if chunk_id in fused:
+            fused[chunk_id]["rrf_score"] += 1.0 / (RRF_K + rank + 1)
+            fused[chunk_id]["lexical_score"] = ctx["lexical_score"]
+            fused[chunk_id]["match"] = "both"
+        else:
+            fused[chunk_id] = dict(ctx, rrf_score=1.0 / (RRF_K + rank + 1))
+    ranked = sorted(fused.items(), key=lambda item: -item[1]["rrf_score"])[:top_k]
+    for _, ctx in ranked:
+        ctx["rrf_score"] = round(ctx["rrf_score"], 5)
+    return ranked
+
+
+def _distance(space, q, v):
+    """The distance Chroma reports for `space` (its hnsw:space, l2 by default)."""
+    if space == "cosine":
+        return 1.0 - float(q @ v) / ((float(np.linalg.norm(q)) * float(np.linalg.norm(v))) or 1.0)
+    if space == "ip":
+        return 1.0 - float(q @ v)
+    return float(np.sum((q - v) ** 2))
+
+
+def _fill_cosine(collection, fused_rows, query_embeddings):
+    """
+    One collection.get for every lexical-only chunk, scored exactly like the
+    dense hits (1 - distance), so "score" means the same for every context.
+    """
+    missing = sorted({chunk_id for row in fused_rows for chunk_id, ctx in row if ctx["score"] is None})
+    if not missing:
+        return
+    got = collection.get(ids=missing, include=["embeddings"])
+    vectors = {chunk_id: np.asarray(v, dtype="float32") for chunk_id, v in zip(got["ids"], got["embeddings"])}
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    for row, query in zip(fused_rows, query_embeddings):
+        q = np.asarray(query, dtype="float32")
+        for chunk_id, ctx in row:
+            if ctx["score"] is None and chunk_id in vectors:
+                ctx["score"] = round(max(0.0, 1.0 - _distance(space, q, vectors[chunk_id])), 3)
+
+
+def retrieve_lexical_batch(queries, top_k: int = 5, mode: str = None):
+    """
+    Lexical-only fast path (hybrid mode only): identifier-heavy queries
+    (error codes, SKUs, order numbers) are answered from BM25 alone, with
+    no embedding pass.
+    Returns contexts per query, or None where the dense/hybrid path is needed.
+    """
+    index = bm25.get() if (mode or RETRIEVAL_MODE) == "hybrid" else None
+    out = []
+    for query in queries:
+        hits = []
+        if index is not None and identifier_ratio(query) >= LEXICAL_FAST_PATH_RATIO:
+            with stage("bm25_search"):
+                hits = index.search(query, top_k)
+        out.append(_lexical_contexts(index, hits) if hits else None)
+    return out
+
+
+def retrieve_context(query: str, top_k: int = 5, mode: str = None):
+    lexical = retrieve_lexical_batch([query], top_k, mode=mode)[0]
+    if lexical is not None:
+        return lexical
+    return retrieve_contexts_batch([query], top_k=top_k, mode=mode)[0]
+
+
+def embed_queries(queries):
+    """Query embeddings from the shared model (LRU-cached, micro-batched)."""
+    return get_embedding_model().embed(list(queries))
+
+
+def index_version() -> int:
+    try:
+        return MANIFEST_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def retrieve_contexts_batch(queries, top_k: int = 5, query_embeddings=None, mode: str = None, collection=None):
+    """
+    Multi-query retrieval: one batched embedding pass and one Chroma query
+    for all queries. Returns one context list per query, in order.
+    Pass query_embeddings to skip re-embedding queries already embedded;
+    otherwise they are embedded with the shared model.
+    In hybrid mode each dense row is fused with BM25 hits (RRF): results
+    are ordered by "rrf_score" while "score" stays the vector similarity.
+    collection defaults to the knowledge-base collection.
+    """
+    if not queries:
+        return []
+
+    mode = mode or RETRIEVAL_MODE
+    index = bm25.get() if mode == "hybrid" else None
+    n_results = max(top_k, HYBRID_CANDIDATES) if index is not None else top_k
+
+    if query_embeddings is None:
+        query_embeddings = embed_queries(queries)
+
+    collection = collection or get_collection()
+    with stage("chroma_query"):
+        results = collection.query(
+            query_embeddings=[list(map(float, e)) for e in query_embeddings],
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"]
+        )
+
+    if index is None:
+        return [_to_contexts(results, row) for row in range(len(queries))]
+    with stage("hybrid_fuse"):
+        fused = [
+            _fuse(results, row, index, index.search(q, n_results), top_k)
+            for row, q in enumerate(queries)
+        ]
+        _fill_cosine(collection, fused, query_embeddings)
+    return [[ctx for _, ctx in row] for row in fused]
+
+
+WARMUP_QUERY = "How do I reset my password?"
+
+
+def warmup_steps():
+    """Open everything and push one query through it (allocates buffers, fills caches)."""
+    return [
+        ("chroma_collection", get_collection),
+        ("query_embedding", lambda: embed_queries([WARMUP_QUERY])),
+        ("bm25_index", bm25.get),
+        ("retrieval", lambda: retrieve_contexts_batch([WARMUP_QUERY], top_k=3)),
+    ]
+
+
 if __name__ == "__main__":
     print("🔎 Testing retrieval...")
     res = retrieve_context("What are the symptoms of diabetes?")
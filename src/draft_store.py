@@ -3,11 +3,89 @@
 from datetime import datetime
 from pathlib import Path
 import json
-from typing import Optional, List, Dict
+import sqlite3
+import sys
+import threading
+from typing import Optional, List, Dict, Iterable
 
 DRAFT_DIR = Path("drafts")
 DRAFT_DIR.mkdir(exist_ok=True)
 
+DB_PATH = DRAFT_DIR / "drafts.db"
+
+PENDING_STATUSES = ("PENDING_APPROVAL", "SAVE_DRAFT", "ADMIN_DRAFT")
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+_COLUMNS = ("ticket_id", "email", "draft", "confidence", "status", "gmail_draft_id", "timestamp")
+
+
+def _init_db(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS drafts (
+            ticket_id TEXT PRIMARY KEY,
+            email TEXT,
+            draft TEXT,
+            confidence REAL,
+            status TEXT,
+            gmail_draft_id TEXT,
+            timestamp TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_drafts_status_ts ON drafts(status, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_drafts_ts ON drafts(timestamp)")
+    conn.execute("CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.commit()
+
+
+def _get_conn():
+    """
+    One connection per thread; WAL lets readers run alongside the writer.
+    The first connection in the process creates the schema and imports
+    legacy JSON drafts once.
+    """
+    global _initialized
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        return conn
+
+    conn = sqlite3.connect(str(DB_PATH), timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    _local.conn = conn
+
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                _init_db(conn)
+                done = conn.execute(
+                    "SELECT value FROM store_meta WHERE key = 'json_migrated'"
+                ).fetchone()
+                if done is None:
+                    migrate_json_drafts(conn=conn)
+                _initialized = True
+    return conn
+
+
+def _row_to_dict(row) -> Dict:
+    return {k: row[k] for k in _COLUMNS}
+
+
+_UPSERT = """
+    INSERT INTO drafts (ticket_id, email, draft, confidence, status, gmail_draft_id, timestamp)
+    VALUES (?,?,?,?,?,?,?)
+    ON CONFLICT(ticket_id) DO UPDATE SET
+        email = excluded.email,
+        draft = excluded.draft,
+        confidence = excluded.confidence,
+        status = excluded.status,
+        gmail_draft_id = COALESCE(excluded.gmail_draft_id, gmail_draft_id),
+        timestamp = excluded.timestamp
+"""
+
 
 def save_draft(
     ticket_id: str,
@@ -18,55 +96,192 @@ def save_draft(
     gmail_draft_id: Optional[str] = None
 ) -> str:
     """
-    Persist a ticket draft to disk.
+    Persist a ticket draft.
     This is the single source of truth for approval + Gmail workflow.
     """
+    conn = _get_conn()
+    with conn:
+        conn.execute(_UPSERT, (
+            ticket_id,
+            email,
+            body,
+            confidence,
+            status,
+            gmail_draft_id,   # MUST be persisted
+            datetime.utcnow().isoformat()
+        ))
+
+    return draft_location(ticket_id)
+
 
-    data = {
+def make_draft_record(
+    ticket_id: str,
+    email: str,
+    body: str,
+    confidence: float,
+    status: str = "SAVE_DRAFT",
+    gmail_draft_id: Optional[str] = None
+) -> Dict:
+    return {
         "ticket_id": ticket_id,
         "email": email,
         "draft": body,
         "confidence": confidence,
         "status": status,
-        "gmail_draft_id": gmail_draft_id,   # MUST be persisted
+        "gmail_draft_id": gmail_draft_id,
         "timestamp": datetime.utcnow().isoformat()
     }
 
-    path = DRAFT_DIR / f"draft_{ticket_id}.json"
 
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+def save_drafts(records: List[Dict], durable: bool = False) -> int:
+    """
+    Upsert many draft records (see make_draft_record) in one transaction.
+    durable=True makes this commit fsync (synchronous=FULL).
+    """
+    if not records:
+        return 0
+    conn = _get_conn()
+    conn.execute(f"PRAGMA synchronous={'FULL' if durable else 'NORMAL'}")
+    with conn:
+        conn.executemany(_UPSERT, [tuple(r[k] for k in _COLUMNS) for r in records])
+    return len(records)
+
 
-    return str(path)
+def draft_location(ticket_id: str) -> str:
+    return f"{DB_PATH}#{ticket_id}"
 
 
 def load_draft(ticket_id: str) -> Optional[Dict]:
     """
     Load a draft by ticket_id.
     """
-    path = DRAFT_DIR / f"draft_{ticket_id}.json"
-    if not path.exists():
-        return None
+    row = _get_conn().execute(
+        "SELECT * FROM drafts WHERE ticket_id = ?", (ticket_id,)
+    ).fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def load_drafts(ticket_ids: Iterable[str]) -> Dict[str, Dict]:
+    """
+    Load many drafts in one query; missing ids are absent from the result.
+    """
+    ticket_ids = list(ticket_ids)
+    found = {}
+    conn = _get_conn()
+    # stay under SQLite's bound-parameter limit
+    for start in range(0, len(ticket_ids), 500):
+        chunk = ticket_ids[start:start + 500]
+        rows = conn.execute(
+            f"SELECT * FROM drafts WHERE ticket_id IN ({','.join('?' * len(chunk))})", chunk
+        ).fetchall()
+        for row in rows:
+            found[row["ticket_id"]] = _row_to_dict(row)
+    return found
+
+
+def set_gmail_draft_id(ticket_id: str, gmail_draft_id: str) -> bool:
+    """
+    Attach a Gmail draft id without touching the draft's status.
+    """
+    conn = _get_conn()
+    with conn:
+        cur = conn.execute(
+            "UPDATE drafts SET gmail_draft_id = ? WHERE ticket_id = ?",
+            (gmail_draft_id, ticket_id)
+        )
+    return cur.rowcount > 0
+
+
+def update_statuses(ticket_ids: Iterable[str], status: str) -> int:
+    """
+    Set the same status on many drafts in a single transaction.
+    """
+    ts = datetime.utcnow().isoformat()
+    conn = _get_conn()
+    with conn:
+        cur = conn.executemany(
+            "UPDATE drafts SET status = ?, timestamp = ? WHERE ticket_id = ?",
+            [(status, ts, t) for t in ticket_ids]
+        )
+    return cur.rowcount
+
+
+def list_drafts(
+    statuses: Optional[Iterable[str]] = None,
+    limit: int = 100,
+    offset: int = 0,
+    newest_first: bool = True
+) -> List[Dict]:
+    """
+    Paginated listing, optionally filtered by status (served by the status/timestamp index).
+    """
+    order = "DESC" if newest_first else "ASC"
+    if statuses:
+        statuses = list(statuses)
+        rows = _get_conn().execute(
+            f"SELECT * FROM drafts WHERE status IN ({','.join('?' * len(statuses))}) "
+            f"ORDER BY timestamp {order} LIMIT ? OFFSET ?",
+            (*statuses, limit, offset)
+        ).fetchall()
+    else:
+        rows = _get_conn().execute(
+            f"SELECT * FROM drafts ORDER BY timestamp {order} LIMIT ? OFFSET ?",
+            (limit, offset)
+        ).fetchall()
+    return [_row_to_dict(r) for r in rows]
+
 
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+def count_drafts(statuses: Optional[Iterable[str]] = None) -> int:
+    if statuses:
+        statuses = list(statuses)
+        row = _get_conn().execute(
+            f"SELECT COUNT(*) FROM drafts WHERE status IN ({','.join('?' * len(statuses))})",
+            statuses
+        ).fetchone()
+    else:
+        row = _get_conn().execute("SELECT COUNT(*) FROM drafts").fetchone()
+    return row[0]
 
 
-def list_pending_approvals() -> List[Dict]:
+def list_pending_approvals(limit: int = 100, offset: int = 0) -> List[Dict]:
     """
     Return drafts that still require human action.
     """
-    drafts = []
+    return list_drafts(PENDING_STATUSES, limit=limit, offset=offset)
+
+
+def migrate_json_drafts(json_dir: Path = DRAFT_DIR, conn=None) -> int:
+    """
+    One-time import of legacy drafts/draft_*.json files.
+    Rows already in the database win; the JSON files are left in place.
+    """
+    conn = conn or _get_conn()
+    rows = []
+    for path in json_dir.glob("draft_*.json"):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[draft_store] skipping {path.name}: {e}")
+            continue
+        rows.append(tuple(data.get(k) for k in _COLUMNS))
 
-    for path in DRAFT_DIR.glob("draft_*.json"):
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO drafts (ticket_id, email, draft, confidence, status, gmail_draft_id, timestamp) "
+            "VALUES (?,?,?,?,?,?,?)",
+            rows
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('json_migrated', ?)",
+            (datetime.utcnow().isoformat(),)
+        )
+    if rows:
+        print(f"[draft_store] migrated {len(rows)} JSON drafts into {DB_PATH}")
+    return len(rows)
 
-            if data.get("status") in {
-                "PENDING_APPROVAL",
-                "SAVE_DRAFT",
-                "ADMIN_DRAFT"
-            }:
-                drafts.append(data)
 
-    return drafts
+if __name__ == "__main__":
+    # python -m src.draft_store migrate  -> (re-)import drafts/draft_*.json
+    if sys.argv[1:] == ["migrate"]:
+        print(f"Imported {migrate_json_drafts()} drafts")
@@ -0,0 +1,135 @@
+# src/embed_batcher.py
+"""
+Dynamic micro-batching for query embeddings.
+
+Concurrent callers each asking for a handful of texts are coalesced: a
+single scheduler thread waits up to EMBED_MICROBATCH_WINDOW_MS after the
+first request (or until EMBED_MICROBATCH_MAX texts are queued), runs one
+forward pass for all of them and hands every caller its own rows.
+Calls already at or above the max batch size go straight to the model.
+"""
+import os
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+
+import numpy as np
+
+from src.metrics import histogram
+
+EMBED_MICROBATCH_WINDOW_MS = float(os.environ.get("EMBED_MICROBATCH_WINDOW_MS", "2"))  # 0 disables batching
+EMBED_MICROBATCH_MAX = int(os.environ.get("EMBED_MICROBATCH_MAX", "64"))
+
+BATCH_SIZE_BOUNDS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+WAIT_MS_BOUNDS = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+_batchers = weakref.WeakSet()
+
+
+class MicroBatcher:
+
+    def __init__(self, encode_fn, window_ms=EMBED_MICROBATCH_WINDOW_MS,
+                 max_batch=EMBED_MICROBATCH_MAX, name="embed"):
+        self.encode_fn = encode_fn
+        self.window_seconds = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # direct calls come from any request thread, batches from the scheduler
+        self._stats_lock = threading.Lock()
+        self.batch_size = histogram(
+            "embed_batch_size", "Texts per embedding forward pass.", BATCH_SIZE_BOUNDS, batcher=name)
+        self.queue_wait_ms = histogram(
+            "embed_batch_queue_wait_ms", "Time texts wait for their batch, in ms.", WAIT_MS_BOUNDS, batcher=name)
+        self.stats = {"requests": 0, "batches": 0, "texts": 0, "direct": 0}
+        _batchers.add(self)
+
+    @property
+    def enabled(self):
+        return self.window_seconds > 0 and self.max_batch > 1
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+                    self._thread.start()
+
+    def encode(self, texts):
+        """texts: list[str] -> (n, dim) float32, possibly computed together with other callers' texts."""
+        texts = list(texts)
+        if not self.enabled or len(texts) >= self.max_batch or not texts:
+            with self._stats_lock:
+                self.stats["direct"] += 1
+            return self.encode_fn(texts)
+        self._ensure_started()
+        future = Future()
+        self._queue.put((texts, future, time.perf_counter()))
+        return future.result()
+
+    # ----------------------------
+    # Scheduler
+    # ----------------------------
+    def _collect(self, first):
+        """
+        Take everything already queued (a backlog built up during the last
+        forward pass), then linger until the window measured from the
+        oldest request closes.
+        """
+        group = [first]
+        n = len(first[0])
+        deadline = first[2] + self.window_seconds
+        while n < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            group.append(item)
+            n += len(item[0])
+        return group
+
+    def _run(self):
+        while True:
+            group = self._collect(self._queue.get())
+            started = time.perf_counter()
+            texts = [t for item in group for t in item[0]]
+            for _, _, enqueued in group:
+                self.queue_wait_ms.observe((started - enqueued) * 1000)
+            self.batch_size.observe(len(texts))
+            with self._stats_lock:
+                self.stats["requests"] += len(group)
+                self.stats["batches"] += 1
+                self.stats["texts"] += len(texts)
+
+            try:
+                vectors = np.asarray(self.encode_fn(texts), dtype="float32")
+            except Exception as e:
+                for _, future, _ in group:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for item_texts, future, _ in group:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {
+            "name": self.name,
+            **stats,
+            "window_ms": self.window_seconds * 1000,
+            "max_batch": self.max_batch,
+            "batch_size": self.batch_size.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot()
+        }
+
+
+def get_batcher_stats():
+    """Stats of every live batcher in the process."""
+    return [b.get_stats() for b in list(_batchers)]
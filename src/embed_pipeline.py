@@ -0,0 +1,249 @@
+# src/embed_pipeline.py
+"""
+Batched, resumable embedding for index builds.
+
+Ingestion runs in a producer thread and feeds fixed-size batches through a
+bounded queue; each embedded batch is appended to an on-disk VectorStore and
+checkpointed. Peak memory is ~ batch_size * queue_depth chunks, not the corpus.
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from src.ingest import iter_chunks
+
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "256"))
+EMBED_QUEUE_DEPTH = int(os.environ.get("EMBED_QUEUE_DEPTH", "4"))
+BUILD_DIR = os.path.join(os.path.dirname(__file__), "..", "index_build")
+
+_DONE = object()
+
+
+class VectorStore:
+    """
+    Append-only vector store: raw float32 rows in vectors.f32, one JSON meta
+    per row in metas.jsonl, and checkpoint.json recording the committed
+    lengths. Anything past the checkpoint is a torn batch and is truncated.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.metas_path = os.path.join(path, "metas.jsonl")
+        self.checkpoint_path = os.path.join(path, "checkpoint.json")
+        self.checkpoint = None
+
+    @property
+    def rows(self):
+        return self.checkpoint["rows"] if self.checkpoint else 0
+
+    @property
+    def dim(self):
+        return self.checkpoint["dim"] if self.checkpoint else None
+
+    def read_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            self.checkpoint = json.load(f)
+        return self.checkpoint
+
+    def _write_checkpoint(self):
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint_path)
+
+    def reset(self, source):
+        os.makedirs(self.path, exist_ok=True)
+        for p in (self.vectors_path, self.metas_path):
+            open(p, "wb").close()
+        self.checkpoint = {
+            "source": source,
+            "dim": None,
+            "rows": 0,
+            "batches": 0,
+            "metas_bytes": 0,
+            "complete": False,
+        }
+        self._write_checkpoint()
+
+    def _truncate(self, rows, metas_bytes):
+        row_bytes = (self.dim or 0) * 4
+        with open(self.vectors_path, "r+b") as f:
+            f.truncate(rows * row_bytes)
+        with open(self.metas_path, "r+b") as f:
+            f.truncate(metas_bytes)
+        self.checkpoint["rows"] = rows
+        self.checkpoint["metas_bytes"] = metas_bytes
+        self._write_checkpoint()
+
+    def rewind_to_file_boundary(self):
+        """
+        Drop the torn tail and the rows of the last (possibly partial) file.
+        Returns the filenames that are fully stored and can be skipped.
+        """
+        committed = self.checkpoint["metas_bytes"]
+        done_files = []
+        last_file, last_start_row, last_start_bytes = None, 0, 0
+        offset = 0
+        with open(self.metas_path, "rb") as f:
+            for row, line in enumerate(f):
+                if offset >= committed:
+                    break
+                fn = json.loads(line)["filename"]
+                if fn != last_file:
+                    if last_file is not None:
+                        done_files.append(last_file)
+                    last_file, last_start_row, last_start_bytes = fn, row, offset
+                offset += len(line)
+        self._truncate(last_start_row, last_start_bytes)
+        return set(done_files)
+
+    def append(self, vectors, metas):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if self.checkpoint["dim"] is None:
+            self.checkpoint["dim"] = int(vectors.shape[1])
+        payload = "".join(json.dumps(m) + "\n" for m in metas).encode("utf-8")
+
+        with open(self.vectors_path, "ab") as f:
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.metas_path, "ab") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # the checkpoint is the commit point for this batch
+        self.checkpoint["rows"] += len(metas)
+        self.checkpoint["batches"] += 1
+        self.checkpoint["metas_bytes"] += len(payload)
+        self._write_checkpoint()
+
+    def finish(self):
+        self.checkpoint["complete"] = True
+        self._write_checkpoint()
+
+    def vectors(self):
+        """Read-only memmap of shape (rows, dim); does not load the file."""
+        if not self.rows:
+            return np.zeros((0, self.dim or 0), dtype="float32")
+        return np.memmap(self.vectors_path, dtype="float32", mode="r", shape=(self.rows, self.dim))
+
+    def iter_metas(self):
+        with open(self.metas_path, "r", encoding="utf-8") as f:
+            for _ in range(self.rows):
+                yield json.loads(f.readline())
+
+    def iter_batches(self, batch_size=None):
+        """Yield (vectors, metas) slices of the committed rows."""
+        batch_size = batch_size or EMBED_BATCH_SIZE
+        vectors = self.vectors()
+        metas = []
+        start = 0
+        for meta in self.iter_metas():
+            metas.append(meta)
+            if len(metas) == batch_size:
+                yield np.array(vectors[start:start + batch_size]), metas
+                start += batch_size
+                metas = []
+        if metas:
+            yield np.array(vectors[start:start + len(metas)]), metas
+
+
+def _produce(folder, done_files, batch_size, q, stop):
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        batch = []
+        for text, meta in iter_chunks(folder, ordered=True, exclude=done_files):
+            batch.append((text, meta))
+            if len(batch) == batch_size:
+                if not put(batch):
+                    return
+                batch = []
+        if batch:
+            put(batch)
+        put(_DONE)
+    except Exception as e:
+        put(e)
+
+
+def build_vector_store(
+    folder,
+    name,
+    model,
+    batch_size=None,
+    queue_depth=None,
+    resume=True,
+):
+    """
+    Embed every chunk of `folder` into index_build/<name>/.
+    An unfinished build of the same folder+model resumes after its last
+    checkpointed batch (rewound to a file boundary); otherwise starts fresh.
+    """
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    queue_depth = queue_depth or EMBED_QUEUE_DEPTH
+    store = VectorStore(os.path.join(BUILD_DIR, name))
+    source = {
+        "folder": os.path.abspath(folder),
+        "model": getattr(model, "model_id", getattr(model, "model_name", None)),
+    }
+
+    ckpt = store.read_checkpoint() if resume else None
+    if ckpt and not ckpt["complete"] and ckpt["source"] == source:
+        done_files = store.rewind_to_file_boundary()
+        print(f"[pipeline] resuming {name}: {store.rows} rows from {len(done_files)} files already embedded")
+    else:
+        store.reset(source)
+        done_files = set()
+
+    q = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_produce,
+        args=(folder, done_files, batch_size, q, stop),
+        name=f"ingest-{name}",
+        daemon=True
+    )
+    producer.start()
+
+    t0 = time.perf_counter()
+    embed_seconds = 0.0
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            texts = [t for t, _ in item]
+            t_embed = time.perf_counter()
+            vectors = model.embed(texts, cache=False)
+            embed_seconds += time.perf_counter() - t_embed
+            store.append(vectors, [m for _, m in item])
+            print(f"[pipeline] {name}: batch {store.checkpoint['batches']} committed ({store.rows} rows)")
+    finally:
+        stop.set()
+        producer.join()
+
+    store.finish()
+    print(
+        f"[pipeline] {name}: {store.rows} rows in {time.perf_counter() - t0:.1f}s "
+        f"(embedding {embed_seconds:.1f}s)"
+    )
+    return store
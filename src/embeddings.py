@@ -1,21 +1,195 @@
 # src/embeddings.py
-from sentence_transformers import SentenceTransformer
+from collections import OrderedDict
+import os
+import threading
+
 import numpy as np
 
+from src.embed_batcher import MicroBatcher
+from src.metrics import stage
+from src import resources
+
 # compact, fast model for PoC
 MODEL_NAME = "all-MiniLM-L6-v2"
 
+# "torch" = SentenceTransformer; "onnx" = exported ONNX model (int8 by default), see src/onnx_embedder.py
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+
+# exact-match cache of recent embeddings, shared by all EmbeddingModel instances
+EMBED_CACHE_SIZE = int(os.environ.get("EMBED_CACHE_SIZE", "4096"))  # 0 disables it
+
+_cache = OrderedDict()  # (model_id, normalized text) -> float32 vector
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def normalize_text(text: str) -> str:
+    # whitespace-only differences do not change the embedding
+    return " ".join(text.split())
+
+
+def get_cache_stats():
+    with _cache_lock:
+        lookups = _cache_stats["hits"] + _cache_stats["misses"]
+        return {
+            **_cache_stats,
+            "size": len(_cache),
+            "capacity": EMBED_CACHE_SIZE,
+            "hit_rate": _cache_stats["hits"] / lookups if lookups else 0.0
+        }
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def embedding_id(model_name: str = MODEL_NAME, backend: str = None) -> str:
+    """
+    Identifies the vectors a backend produces; int8 vectors are close to but
+    not identical with fp32 ones, so indexes and caches keep them apart.
+    """
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "onnx":
+        from src.onnx_embedder import ONNX_QUANTIZED
+        return f"{model_name}@onnx-{'int8' if ONNX_QUANTIZED else 'fp32'}"
+    return model_name
+
+
 class EmbeddingModel:
-    def __init__(self, model_name: str = MODEL_NAME):
-        print("[embeddings] loading model:", model_name)
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = MODEL_NAME, backend: str = None):
+        backend = backend or EMBEDDING_BACKEND
+        print(f"[embeddings] loading model: {model_name} ({backend})")
+        self.model_name = model_name
+        self.backend = backend
+        self.model_id = embedding_id(model_name, backend)
+        if backend == "onnx":
+            from src.onnx_embedder import OnnxEncoder
+            self.model = OnnxEncoder(model_name)
+        else:
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(model_name)
+        # concurrent small requests share one forward pass
+        self.batcher = MicroBatcher(self._encode_direct, name="embeddings")
+
+    def _encode_direct(self, texts):
+        arr = self.model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
+        return np.array(arr, dtype="float32")
+
+    def _encode(self, texts):
+        # cache misses only: batching wait + forward pass
+        with stage("embed"):
+            return self.batcher.encode(texts)
 
-    def embed(self, texts):
+    def embed(self, texts, cache: bool = True):
         """
         texts: list[str] -> returns numpy array (n, dim) dtype float32
+        Only texts missing from the LRU cache are encoded; pass cache=False
+        for one-off corpus text so it does not flush out hot queries.
         """
-        arr = self.model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
-        return np.array(arr, dtype="float32")
+        if len(texts) == 0:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype="float32")
+        if not cache or EMBED_CACHE_SIZE <= 0:
+            return self._encode(texts)
+
+        keys = [(self.model_id, normalize_text(t)) for t in texts]
+        found = {}
+        with _cache_lock:
+            for key in keys:
+                if key in found:
+                    continue
+                vector = _cache.get(key)
+                if vector is not None:
+                    _cache.move_to_end(key)
+                    found[key] = vector
+            missing = [k for k in dict.fromkeys(keys) if k not in found]
+            _cache_stats["hits"] += len(keys) - len(missing)
+            _cache_stats["misses"] += len(missing)
+
+        if missing:
+            vectors = self._encode([text for _, text in missing])
+            with _cache_lock:
+                for key, vector in zip(missing, vectors):
+                    # a row view would pin the whole (batch, dim) encode output in the cache
+                    vector = vector.copy()
+                    vector.flags.writeable = False
+                    found[key] = vector
+                    _cache[key] = vector
+                while len(_cache) > EMBED_CACHE_SIZE:
+                    _cache.popitem(last=False)
+                    _cache_stats["evictions"] += 1
+
+        return np.stack([found[k] for k in keys])
+
+
+# ----------------------------
+# Process-wide model registry
+# ----------------------------
+def get_embedding_model(model_name: str = MODEL_NAME, backend: str = None) -> "EmbeddingModel":
+    """
+    The one EmbeddingModel per (model, backend) in this process. Chroma,
+    the sklearn/FAISS/hnsw indexes and the apps all share its weights,
+    thread pool, micro-batcher and LRU cache.
+    """
+    backend = backend or EMBEDDING_BACKEND
+    return resources.register(
+        f"embedding_model:{embedding_id(model_name, backend)}",
+        lambda: EmbeddingModel(model_name, backend=backend)
+    ).get()
+
+
+_adapter_classes = {}
+_adapter_lock = threading.Lock()
+
+
+def _chroma_adapter_class(backend):
+    """
+    Chroma EmbeddingFunction over the shared model. Its name/config match
+    what existing collections were created with ("sentence_transformer" for
+    torch, "rag_onnx" for onnx) so they open without re-embedding.
+    """
+    with _adapter_lock:
+        if backend in _adapter_classes:
+            return _adapter_classes[backend]
+        from chromadb.api.types import EmbeddingFunction
+
+        class SharedEmbeddingFunction(EmbeddingFunction):
+            def __init__(self, model_name: str = MODEL_NAME):
+                self.model_name = model_name
+
+            @property
+            def model(self):
+                return get_embedding_model(self.model_name, backend)
+
+            def __call__(self, input):
+                # documents: one-off text, keep it out of the query LRU
+                return list(self.model.embed(list(input), cache=False))
+
+            def embed_query(self, input):
+                return list(self.model.embed(list(input)))
+
+            @staticmethod
+            def name():
+                return "rag_onnx" if backend == "onnx" else "sentence_transformer"
+
+            def get_config(self):
+                if backend == "onnx":
+                    from src.onnx_embedder import ONNX_QUANTIZED
+                    return {"model_name": self.model_name, "quantized": ONNX_QUANTIZED}
+                return {"model_name": self.model_name, "device": "cpu", "normalize_embeddings": False, "kwargs": {}}
+
+            @staticmethod
+            def build_from_config(config):
+                return SharedEmbeddingFunction(config["model_name"])
+
+        _adapter_classes[backend] = SharedEmbeddingFunction
+        return SharedEmbeddingFunction
+
+
+def chroma_embedding_function(model_name: str = MODEL_NAME):
+    """Chroma embedding function backed by the shared model for EMBEDDING_BACKEND."""
+    return _chroma_adapter_class(EMBEDDING_BACKEND)(model_name)
+
 
 if __name__ == "__main__":
     m = EmbeddingModel()
@@ -1,94 +1,163 @@
-# src/app_faiss.py
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import traceback
-import threading
-import importlib
+# src/index_faiss.py
+import os, pickle
+import math
+import time
+from src.embed_pipeline import build_vector_store
 
-app = FastAPI(title="RAG PoC - Index Retrieval (lazy init, package-safe)")
+from src.resident_index import ResidentIndex, write_version_marker
+import numpy as np
+import faiss
 
-_singletons = {}
-_singleton_lock = threading.Lock()
+INDEX_PATH = os.path.join(os.path.dirname(__file__), "..", "faiss_index.bin")
+META_PATH = os.path.join(os.path.dirname(__file__), "..", "faiss_meta.pkl")
+VERSION_PATH = os.path.join(os.path.dirname(__file__), "..", "faiss_index.version")
 
-def ensure_module(module_name: str):
+# "flat" = exact inner product, "ivf" = inverted lists, "hnsw" = graph
+INDEX_TYPE = os.environ.get("FAISS_INDEX_TYPE", "flat").lower()
+IVF_NLIST = int(os.environ.get("FAISS_IVF_NLIST", "0"))   # 0 -> ~4*sqrt(n)
+IVF_NPROBE = int(os.environ.get("FAISS_IVF_NPROBE", "8"))
+HNSW_M = int(os.environ.get("FAISS_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("FAISS_HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.environ.get("FAISS_HNSW_EF_SEARCH", "64"))
+USE_MMAP = os.environ.get("FAISS_MMAP", "1") != "0"
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+
+def _make_index(index_type, dim, n_vectors):
     """
-    Import a module using full package path (src.<module>) if available,
-    otherwise try plain module_name. Return imported module object.
+    All index types use inner product over L2-normalised vectors,
+    so scores are cosine similarities like the sklearn backend.
     """
-    # prefer explicit package import
-    try:
-        full_name = f"src.{module_name}"
-        return importlib.import_module(full_name)
-    except ModuleNotFoundError:
-        # fallback to top-level import (useful if you run differently)
-        return importlib.import_module(module_name)
-
-def get_embedding_model():
-    if "emb_model" in _singletons:
-        return _singletons["emb_model"]
-    with _singleton_lock:
-        if "emb_model" in _singletons:
-            return _singletons["emb_model"]
-        # import lazily using package-safe loader
-        mod = ensure_module("embeddings")
-        EmbeddingModel = getattr(mod, "EmbeddingModel")
-        _singletons["emb_model"] = EmbeddingModel()
-        return _singletons["emb_model"]
-
-def get_search_fn():
-    if "search_fn" in _singletons:
-        return _singletons["search_fn"]
-    with _singleton_lock:
-        if "search_fn" in _singletons:
-            return _singletons["search_fn"]
-        # try index_faiss, then sklearn, then hnsw - using package-safe imports
-        for candidate in ("index_faiss", "index_sklearn", "index_hnsw"):
-            try:
-                mod = ensure_module(candidate)
-                if hasattr(mod, "search"):
-                    _singletons["search_fn"] = getattr(mod, "search")
-                    # also capture build_index if present
-                    _singletons["build_index_fn"] = getattr(mod, "build_index", None)
-                    return _singletons["search_fn"]
-            except ModuleNotFoundError:
-                continue
-        raise RuntimeError("No index backend available. Ensure index_faiss.py or index_sklearn.py exists in src/")
-
-class QueryRequest(BaseModel):
-    query: str
-    top_k: int = 5
-
-@app.post("/query")
-def query(req: QueryRequest):
-    try:
-        # lazy init
-        _ = get_embedding_model()    # ensure model loaded (if needed)
-        search_fn = get_search_fn()
-        results = search_fn(req.query, top_k=req.top_k)
-        return {"query": req.query, "results": results}
-    except Exception as e:
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.post("/rebuild")
-def rebuild():
-    try:
-        # try to call a build_index function from whichever module we loaded
-        # this was stored in singletons by get_search_fn
-        build_fn = _singletons.get("build_index_fn", None)
-        if build_fn is not None:
-            build_fn("sample_docs")
-            return {"status": "ok", "message": "index rebuilt via backend build_index"}
-        # fallback: try to import explicit module builders
-        for candidate in ("index_faiss", "index_sklearn", "index_hnsw"):
+    if index_type == "flat":
+        return faiss.IndexFlatIP(dim)
+    if index_type == "ivf":
+        nlist = IVF_NLIST or int(4 * math.sqrt(n_vectors))
+        # faiss wants ~39 training points per centroid; never more lists than vectors
+        nlist = max(1, min(nlist, n_vectors // 39 or 1))
+        quantizer = faiss.IndexFlatIP(dim)
+        return faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return index
+    raise ValueError(f"Unknown FAISS index type {index_type!r}; expected one of {INDEX_TYPES}")
+
+
+def _apply_search_params(index):
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = IVF_NPROBE
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+
+
+def build_index(folder="sample_docs", index_type=None, resume=True):
+    index_type = (index_type or INDEX_TYPE).lower()
+    print(f"[faiss] ingesting + embedding docs in batches (index_type={index_type})...")
+    store = build_vector_store(folder, "faiss", _index.get_model(), resume=resume)
+    if store.rows == 0:
+        raise ValueError("No texts found in sample_docs.")
+
+    index = _make_index(index_type, store.dim, store.rows)
+    if not index.is_trained:
+        # train on a bounded random sample rather than the whole memmap
+        vectors = store.vectors()
+        n_train = min(store.rows, max(index.nlist * 256, 10000))
+        sample_ids = np.sort(np.random.default_rng(0).choice(store.rows, n_train, replace=False))
+        sample = np.ascontiguousarray(vectors[sample_ids], dtype="float32")
+        faiss.normalize_L2(sample)
+        index.train(sample)
+        del sample
+
+    metas = []
+    for batch, batch_metas in store.iter_batches():
+        batch = np.ascontiguousarray(batch, dtype="float32")
+        faiss.normalize_L2(batch)
+        index.add(batch)
+        metas.extend(batch_metas)
+
+    # write to temp paths then rename, so a concurrent reader never sees half a file
+    faiss.write_index(index, INDEX_PATH + ".tmp")
+    with open(META_PATH + ".tmp", "wb") as f:
+        pickle.dump(metas, f)
+    os.replace(INDEX_PATH + ".tmp", INDEX_PATH)
+    os.replace(META_PATH + ".tmp", META_PATH)
+    write_version_marker(VERSION_PATH)
+    print(f"[faiss] {index_type} index built with {index.ntotal} vectors (dim={store.dim})")
+
+
+class FaissIndex(ResidentIndex):
+    """
+    Process-resident FAISS index, memory-mapped from disk where the index
+    type supports it. Reloads when build_index() bumps the version marker.
+    """
+
+    def __init__(self, index_path=INDEX_PATH, meta_path=META_PATH, version_path=VERSION_PATH, model=None):
+        super().__init__(index_path, meta_path, version_path, model=model, mmap=False)
+
+    def _load(self):
+        t0 = time.perf_counter()
+        mmap = False
+        if USE_MMAP:
             try:
-                mod = ensure_module(candidate)
-                if hasattr(mod, "build_index"):
-                    getattr(mod, "build_index")("sample_docs")
-                    return {"status": "ok", "message": f"index rebuilt via {candidate}.build_index"}
-            except ModuleNotFoundError:
+                index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP)
+                mmap = True
+            except RuntimeError:
+                # not every index type can be mapped (e.g. HNSW graphs)
+                index = faiss.read_index(self.index_path)
+        else:
+            index = faiss.read_index(self.index_path)
+        _apply_search_params(index)
+        with open(self.meta_path, "rb") as f:
+            metas = pickle.load(f)
+
+        self._set_stat("mmap", mmap)
+        print(f"[faiss] loaded index with {index.ntotal} vectors in {time.perf_counter() - t0:.3f}s (mmap={mmap})")
+        return index, metas
+
+    def search(self, query, top_k=5):
+        index, metas = self._ensure_current()
+        model = self.get_model()
+
+        t0 = time.perf_counter()
+        qv = np.ascontiguousarray(model.embed([query]), dtype="float32")
+        faiss.normalize_L2(qv)
+
+        k = max(1, min(top_k, index.ntotal))
+        scores, indices = index.search(qv, k)
+        results = []
+        for score, idx in zip(scores[0], indices[0]):
+            if idx < 0:  # IVF/HNSW pad with -1 when fewer than k hits are found
                 continue
-        raise RuntimeError("No index builder found in available backends.")
-    except Exception as e:
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
+            results.append({"score": float(score), "meta": metas[int(idx)]})
+
+        self._record_search(time.perf_counter() - t0)
+        return results
+
+    def _extra_stats(self):
+        index = self._state[0] if self._state is not None else None
+        return {
+            "n_samples": index.ntotal if index is not None else 0,
+            "index_type": type(index).__name__ if index is not None else None
+        }
+
+
+_index = FaissIndex()
+
+
+def search(query, top_k=5):
+    """
+    Return list of {score, meta} for up to top_k nearest chunks
+    (same shape as index_sklearn.search; score is cosine similarity).
+    """
+    return _index.search(query, top_k=top_k)
+
+
+def get_stats():
+    return _index.get_stats()
+
+
+if __name__ == "__main__":
+    build_index("sample_docs")
+    print(search("How do I reset my password?", top_k=5))
+    print(get_stats())
@@ -0,0 +1,368 @@
+# src/index_hnsw.py
+import atexit
+import os, pickle
+import threading
+import time
+from contextlib import contextmanager
+from src.ingest import iter_chunks
+from src.embed_pipeline import build_vector_store, EMBED_BATCH_SIZE
+
+from src.resident_index import ResidentIndex
+import numpy as np
+import hnswlib
+
+INDEX_PATH = os.path.join(os.path.dirname(__file__), "..", "hnsw_index.bin")
+META_PATH = os.path.join(os.path.dirname(__file__), "..", "hnsw_meta.pkl")
+VERSION_PATH = os.path.join(os.path.dirname(__file__), "..", "hnsw_index.version")
+
+# graph degree / build beam width are fixed at build time; ef_search is per query
+HNSW_M = int(os.environ.get("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.environ.get("HNSW_EF_SEARCH", "50"))
+# headroom reserved on resize so add_items does not reallocate every call
+GROWTH_FACTOR = 1.5
+# add_items() saves the graph at most this often (the whole graph is rewritten per save)
+HNSW_PERSIST_SECONDS = float(os.environ.get("HNSW_PERSIST_SECONDS", "2.0"))
+
+
+class _RWLock:
+    """
+    Many concurrent knn_query readers or one writer (resize/add/set_ef):
+    hnswlib does not allow resize_index alongside queries. Writers are
+    preferred so a steady query stream cannot starve add_items().
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class _MetaStore:
+    """
+    Compact column-wise metadata sidecar: filenames are interned once and
+    each label stores (file_id, chunk_index, text).
+    """
+
+    def __init__(self):
+        self.filenames = []
+        self._file_ids = {}
+        self.file_id = np.zeros(0, dtype="int32")
+        self.chunk_index = np.zeros(0, dtype="int32")
+        self.texts = []
+        self.dim = None
+
+    def __len__(self):
+        return len(self.texts)
+
+    def extend(self, metas):
+        fids, cidx = [], []
+        for m in metas:
+            fn = m.get("filename", "unknown")
+            if fn not in self._file_ids:
+                self._file_ids[fn] = len(self.filenames)
+                self.filenames.append(fn)
+            fids.append(self._file_ids[fn])
+            cidx.append(int(m.get("chunk_index", 0)))
+            self.texts.append(m.get("text", ""))
+        self.file_id = np.concatenate([self.file_id, np.asarray(fids, dtype="int32")])
+        self.chunk_index = np.concatenate([self.chunk_index, np.asarray(cidx, dtype="int32")])
+
+    def get(self, label):
+        return {
+            "filename": self.filenames[int(self.file_id[label])],
+            "chunk_index": int(self.chunk_index[label]),
+            "text": self.texts[label],
+        }
+
+    def dump(self, path):
+        with open(path, "wb") as f:
+            pickle.dump({
+                "filenames": self.filenames,
+                "file_id": self.file_id,
+                "chunk_index": self.chunk_index,
+                "texts": self.texts,
+                "dim": self.dim,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        store = cls()
+        store.filenames = data["filenames"]
+        store._file_ids = {fn: i for i, fn in enumerate(store.filenames)}
+        store.file_id = data["file_id"]
+        store.chunk_index = data["chunk_index"]
+        store.texts = data["texts"]
+        store.dim = data["dim"]
+        return store
+
+
+class HnswIndex(ResidentIndex):
+    """
+    Process-resident hnswlib graph with incremental add_items().
+    Scores are cosine similarities, matching the sklearn/FAISS backends.
+    """
+
+    def __init__(self, m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, ef_search=HNSW_EF_SEARCH,
+                 index_path=INDEX_PATH, meta_path=META_PATH, version_path=VERSION_PATH, model=None):
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        super().__init__(index_path, meta_path, version_path, model=model, items_added=0, saves=0)
+        self._rw = _RWLock()
+        self._persist_lock = threading.Lock()
+        self._persist_timer = None
+        self._dirty = False
+
+    # ----------------------------
+    # Persistence
+    # ----------------------------
+    def _load(self):
+        t0 = time.perf_counter()
+        metas = _MetaStore.load(self.meta_path)
+        graph = hnswlib.Index(space="cosine", dim=metas.dim)
+        graph.load_index(self.index_path)
+        graph.set_ef(self.ef_search)
+        print(f"[hnsw] loaded graph with {graph.get_current_count()} vectors in {time.perf_counter() - t0:.3f}s")
+        return graph, metas
+
+    def _persist(self):
+        graph, metas = self._state
+        graph.save_index(self.index_path + ".tmp")
+        metas.dim = graph.dim
+        metas.dump(self.meta_path + ".tmp")
+        os.replace(self.index_path + ".tmp", self.index_path)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+        # our own write: no need to reload on the next search
+        self._mark_written()
+        self._add_stat("saves")
+
+    def _schedule_persist(self):
+        with self._persist_lock:
+            self._dirty = True
+            if self._persist_timer is None:
+                self._persist_timer = threading.Timer(HNSW_PERSIST_SECONDS, self.flush)
+                self._persist_timer.daemon = True
+                self._persist_timer.start()
+
+    def flush(self):
+        """Write pending changes to disk now. Returns True if anything was saved."""
+        with self._persist_lock:
+            if self._persist_timer is not None:
+                self._persist_timer.cancel()
+                self._persist_timer = None
+            if not self._dirty or self._state is None:
+                return False
+            # readers may keep querying while the graph is saved; adds wait
+            with self._rw.read():
+                self._persist()
+            self._dirty = False
+            return True
+
+    # ----------------------------
+    # Build / incremental add
+    # ----------------------------
+    def build(self, texts, metas):
+        if len(texts) == 0:
+            raise ValueError("No texts to index.")
+        vectors = self.get_model().embed(texts, cache=False).astype("float32")
+        with self._lock:
+            graph = hnswlib.Index(space="cosine", dim=vectors.shape[1])
+            graph.init_index(
+                max_elements=len(texts),
+                ef_construction=self.ef_construction,
+                M=self.m
+            )
+            graph.add_items(vectors, np.arange(len(texts)))
+            graph.set_ef(self.ef_search)
+            store = _MetaStore()
+            store.extend(metas)
+            self._state = (graph, store)
+            self._dirty = True
+            self.flush()
+        self._add_stat("items_added", len(texts))
+        print(f"[hnsw] graph built with {len(texts)} vectors (dim={vectors.shape[1]}, M={self.m}, ef_construction={self.ef_construction})")
+
+    def build_from_store(self, store):
+        """Build the graph from a VectorStore batch by batch (no re-embedding)."""
+        if store.rows == 0:
+            raise ValueError("No texts to index.")
+        with self._lock:
+            graph = hnswlib.Index(space="cosine", dim=store.dim)
+            graph.init_index(
+                max_elements=store.rows,
+                ef_construction=self.ef_construction,
+                M=self.m
+            )
+            meta_store = _MetaStore()
+            start = 0
+            for vectors, metas in store.iter_batches():
+                graph.add_items(vectors, np.arange(start, start + len(metas)))
+                meta_store.extend(metas)
+                start += len(metas)
+            graph.set_ef(self.ef_search)
+            self._state = (graph, meta_store)
+            self._dirty = True
+            self.flush()
+        self._add_stat("items_added", store.rows)
+        print(f"[hnsw] graph built with {store.rows} vectors (dim={store.dim}, M={self.m}, ef_construction={self.ef_construction})")
+
+    def add_items(self, texts, metas):
+        """
+        Append chunks to the existing graph without rebuilding it.
+        Falls back to a fresh build when no graph exists yet.
+        """
+        if len(texts) == 0:
+            return 0
+        if self._state is None and not os.path.exists(self.index_path):
+            self.build(texts, metas)
+            return len(texts)
+        vectors = self.get_model().embed(texts, cache=False).astype("float32")
+        with self._lock:
+            graph, store = self._ensure_current()
+            with self._rw.write():
+                start = graph.get_current_count()
+                needed = start + len(texts)
+                if needed > graph.get_max_elements():
+                    graph.resize_index(int(needed * GROWTH_FACTOR))
+                graph.add_items(vectors, np.arange(start, needed))
+                store.extend(metas)
+        # saved within HNSW_PERSIST_SECONDS (or on flush()/exit), not once per call
+        self._schedule_persist()
+        self._add_stat("items_added", len(texts))
+        print(f"[hnsw] added {len(texts)} vectors (total={needed})")
+        return len(texts)
+
+    def set_ef_search(self, ef_search):
+        """Trade recall for latency at query time; must be >= top_k."""
+        with self._rw.write():
+            self.ef_search = ef_search
+            if self._state is not None:
+                self._state[0].set_ef(ef_search)
+
+    def search(self, query, top_k=5):
+        graph, metas = self._ensure_current()
+        model = self.get_model()
+
+        t0 = time.perf_counter()
+        qv = model.embed([query]).astype("float32")
+
+        k = max(1, min(top_k, graph.get_current_count()))
+        results = []
+        if k <= self.ef_search:
+            with self._rw.read():
+                labels, distances = graph.knn_query(qv, k=k)
+                for label, dist in zip(labels[0], distances[0]):
+                    results.append({"score": float(1.0 - dist), "meta": metas.get(int(label))})
+        else:
+            # hnswlib has no per-query ef: raise it for this query only, then restore
+            with self._rw.write():
+                graph.set_ef(k)
+                try:
+                    labels, distances = graph.knn_query(qv, k=k)
+                finally:
+                    graph.set_ef(self.ef_search)
+                for label, dist in zip(labels[0], distances[0]):
+                    results.append({"score": float(1.0 - dist), "meta": metas.get(int(label))})
+
+        self._record_search(time.perf_counter() - t0)
+        return results
+
+    def _extra_stats(self):
+        return {
+            "n_samples": self._state[0].get_current_count() if self._state is not None else 0,
+            "M": self.m,
+            "ef_construction": self.ef_construction,
+            "ef_search": self.ef_search
+        }
+
+
+_index = HnswIndex()
+# pending add_items() must reach disk even if the debounce timer has not fired
+atexit.register(_index.flush)
+
+
+def build_index(folder="sample_docs", resume=True):
+    print("[hnsw] ingesting + embedding docs in batches...")
+    store = build_vector_store(folder, "hnsw", _index.get_model(), resume=resume)
+    if store.rows == 0:
+        raise ValueError("No texts found in sample_docs.")
+    _index.build_from_store(store)
+
+
+def add_items(texts, metas):
+    """Incrementally index extra chunks (metas: {filename, chunk_index, text})."""
+    return _index.add_items(texts, metas)
+
+
+def add_folder(folder):
+    """Ingest a folder and append its chunks to the existing graph in batches."""
+    added = 0
+    texts, metas = [], []
+    for text, meta in iter_chunks(folder):
+        texts.append(text)
+        metas.append(meta)
+        if len(texts) == EMBED_BATCH_SIZE:
+            added += _index.add_items(texts, metas)
+            texts, metas = [], []
+    added += _index.add_items(texts, metas)
+    _index.flush()
+    return added
+
+
+def search(query, top_k=5):
+    """
+    Return list of {score, meta} for up to top_k nearest chunks.
+    """
+    return _index.search(query, top_k=top_k)
+
+
+def set_ef_search(ef_search):
+    _index.set_ef_search(ef_search)
+
+
+def flush():
+    """Save add_items() changes now instead of waiting for the debounce."""
+    return _index.flush()
+
+
+def get_stats():
+    return _index.get_stats()
+
+
+if __name__ == "__main__":
+    build_index("sample_docs")
+    print(search("How do I reset my password?", top_k=5))
+    print(get_stats())
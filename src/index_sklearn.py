@@ -1,82 +1,101 @@
 # src/index_sklearn.py
 import os, pickle
-from src.ingest import ingest_folder
+import time
+from src.embed_pipeline import build_vector_store
 
-from src.embeddings import EmbeddingModel
+from src.resident_index import ResidentIndex, write_version_marker
 import numpy as np
 from sklearn.neighbors import NearestNeighbors
 
 INDEX_PATH = os.path.join(os.path.dirname(__file__), "..", "sklearn_index.pkl")
 META_PATH = os.path.join(os.path.dirname(__file__), "..", "sklearn_meta.pkl")
+# touched after every successful build; long-lived readers reload when it changes
+VERSION_PATH = os.path.join(os.path.dirname(__file__), "..", "sklearn_index.version")
 
-def build_index(folder="sample_docs"):
-    print("[sklearn] ingesting docs...")
-    docs = ingest_folder(folder)
-    texts = []
-    metas = []
-    for d in docs:
-        fn = d["meta"].get("filename", "unknown")
-        for i, chunk in enumerate(d["chunks"]):
-            texts.append(chunk)
-            metas.append({"filename": fn, "chunk_index": i, "text": chunk})
-    if len(texts) == 0:
+def build_index(folder="sample_docs", resume=True):
+    print("[sklearn] ingesting + embedding docs in batches...")
+    store = build_vector_store(folder, "sklearn", _index.get_model(), resume=resume)
+    if store.rows == 0:
         raise ValueError("No texts found in sample_docs.")
-    print(f"[sklearn] {len(texts)} chunks to embed")
-    emb = EmbeddingModel()
-    vectors = emb.embed(texts).astype("float32")
+    # brute-force NearestNeighbors keeps its own in-RAM copy of the vectors anyway
+    vectors = np.asarray(store.vectors(), dtype="float32")
+    metas = list(store.iter_metas())
     nbrs = NearestNeighbors(metric="cosine", algorithm="auto", n_jobs=-1)
     nbrs.fit(vectors)
     with open(INDEX_PATH, "wb") as f:
         pickle.dump(nbrs, f)
     with open(META_PATH, "wb") as f:
         pickle.dump(metas, f)
+    write_version_marker(VERSION_PATH)
     print(f"[sklearn] index built with {len(metas)} vectors (dim={vectors.shape[1]})")
 
+
+class SklearnIndex(ResidentIndex):
+    """
+    Process-resident view of the sklearn index.
+    The embedding model and the fitted NearestNeighbors/meta pickles are loaded
+    once; a rebuilt index is picked up by watching the version marker.
+    """
+
+    def __init__(self, index_path=INDEX_PATH, meta_path=META_PATH, version_path=VERSION_PATH, model=None):
+        super().__init__(index_path, meta_path, version_path, model=model)
+
+    def _load(self):
+        t0 = time.perf_counter()
+        with open(self.index_path, "rb") as f:
+            nbrs = pickle.load(f)
+        with open(self.meta_path, "rb") as f:
+            metas = pickle.load(f)
+
+        # sklearn stores fitted data in attribute _fit_X (private) - fall back to length of metas if needed
+        fit_x = getattr(nbrs, "_fit_X", None)
+        n_samples = fit_x.shape[0] if fit_x is not None else len(metas)
+        print(f"[sklearn] loaded index with {n_samples} vectors in {time.perf_counter() - t0:.3f}s")
+        return nbrs, metas, n_samples
+
+    def search(self, query, top_k=5):
+        nbrs, metas, n_samples = self._ensure_current()
+        model = self.get_model()
+
+        t0 = time.perf_counter()
+        qv = model.embed([query]).astype("float32")
+
+        # cap k
+        k = max(1, min(top_k, n_samples))
+
+        distances, indices = nbrs.kneighbors(qv, n_neighbors=k)
+        results = []
+        for dist, idx in zip(distances[0], indices[0]):
+            meta = metas[int(idx)]
+            score = float(1.0 - dist)  # convert distance->similarity-ish
+            results.append({"score": score, "meta": meta})
+
+        self._record_search(time.perf_counter() - t0)
+        return results
+
+    def _extra_stats(self):
+        state = self._state
+        return {"n_samples": state[2] if state is not None else 0}
+
+
+_index = SklearnIndex()
+
+
 def search(query, top_k=5):
     """
     Return list of {score, meta} for up to top_k nearest chunks.
     This function safely caps requested neighbors to the number of indexed samples.
+    The model and index stay resident; see SklearnIndex.
     """
-    if not os.path.exists(INDEX_PATH) or not os.path.exists(META_PATH):
-        raise RuntimeError("Index or meta not found. Run build_index() first (or call /rebuild).")
-
-    emb = EmbeddingModel()
-    qv = emb.embed([query]).astype("float32")
-
-    with open(INDEX_PATH, "rb") as f:
-        nbrs = pickle.load(f)
-
-    # number of samples in the fitted index
-    # sklearn stores fitted data in attribute _fit_X (private) - fall back to length of metas if needed
-    n_samples = None
-    try:
-        n_samples = getattr(nbrs, "_fit_X", None)
-        if n_samples is not None:
-            n_samples = n_samples.shape[0]
-    except Exception:
-        n_samples = None
-
-    # fallback to meta length
-    if n_samples is None:
-        with open(META_PATH, "rb") as f:
-            metas = pickle.load(f)
-        n_samples = len(metas)
-    else:
-        with open(META_PATH, "rb") as f:
-            metas = pickle.load(f)
+    return _index.search(query, top_k=top_k)
 
-    # cap k
-    k = max(1, min(top_k, n_samples))
 
-    distances, indices = nbrs.kneighbors(qv, n_neighbors=k)
-    results = []
-    for dist, idx in zip(distances[0], indices[0]):
-        meta = metas[int(idx)]
-        score = float(1.0 - dist)  # convert distance->similarity-ish
-        results.append({"score": score, "meta": meta})
-    return results
+def get_stats():
+    """Load-time vs search-time counters for the resident index."""
+    return _index.get_stats()
 
 
 if __name__ == "__main__":
     build_index("sample_docs")
     print(search("How do I reset my password?", top_k=5))
+    print(get_stats())
@@ -1,6 +1,11 @@
 # src/ingest.py
+import itertools
+import multiprocessing
 import os
-from typing import List
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from pypdf import PdfReader
 import docx
 import re
@@ -43,19 +48,144 @@ def chunk_text(text: str, chunk_size_tokens: int = 500, overlap_tokens: int = 10
         i = j - overlap_tokens if (j - overlap_tokens) > i else j
     return chunks
 
-def ingest_folder(folder_path: str):
-    docs = []
-    for fn in os.listdir(folder_path):
-        full = os.path.join(folder_path, fn)
-        if not os.path.isfile(full):
+# PDF/DOCX extraction is CPU-bound; fan files out over processes
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "0")) or (os.cpu_count() or 1)
+# below this many files a process pool costs more than it saves; extract in-process
+INGEST_POOL_MIN_FILES = int(os.environ.get("INGEST_POOL_MIN_FILES", "16"))
+
+def _iter_files(folder_path: str, ordered: bool = False, exclude: Iterable[str] = ()) -> Iterator[str]:
+    exclude = set(exclude)
+    if ordered:
+        for fn in sorted(os.listdir(folder_path)):
+            full = os.path.join(folder_path, fn)
+            if fn not in exclude and os.path.isfile(full):
+                yield full
+        return
+    with os.scandir(folder_path) as it:
+        for entry in it:
+            if entry.name not in exclude and entry.is_file():
+                yield entry.path
+
+def _ingest_file(full: str) -> Dict:
+    """
+    Extract + clean + chunk one file. Runs inside a worker process, so it
+    never raises: failures come back in the "error" field.
+    """
+    fn = os.path.basename(full)
+    t0 = time.perf_counter()
+    try:
+        raw = extract_text(full)
+        raw = clean_text(raw)
+        chunks = chunk_text(raw)
+        error = None
+    except Exception as e:
+        chunks = []
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "meta": {"filename": fn, "path": full},
+        "chunks": chunks,
+        "seconds": time.perf_counter() - t0,
+        "error": error,
+    }
+
+def _record(result: Dict, report: Optional[List[Dict]]):
+    fn = result["meta"]["filename"]
+    if result["error"]:
+        print(f"[ingest] failed {fn}: {result['error']}")
+    else:
+        print(f"[ingest] {fn} -> {len(result['chunks'])} chunks ({result['seconds']:.2f}s)")
+    if report is not None:
+        report.append({
+            "filename": fn,
+            "path": result["meta"]["path"],
+            "chunks": len(result["chunks"]),
+            "seconds": round(result["seconds"], 4),
+            "error": result["error"],
+        })
+
+def iter_ingest(
+    folder_path: str,
+    workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+    report: Optional[List[Dict]] = None,
+    ordered: bool = False,
+    exclude: Iterable[str] = (),
+) -> Iterator[Dict]:
+    """
+    Stream {"meta", "chunks"} docs as files finish extracting (completion order).
+    At most max_pending files (default 2 * workers) are in flight, so memory
+    stays bounded regardless of folder size. Per-file timings and failures
+    are appended to `report` when a list is passed.
+    ordered=True yields in sorted filename order instead, which resumable
+    builds rely on; filenames in `exclude` are skipped without being read.
+    """
+    workers = workers or INGEST_WORKERS
+    files = _iter_files(folder_path, ordered=ordered, exclude=exclude)
+    head = list(itertools.islice(files, INGEST_POOL_MIN_FILES))
+    files = itertools.chain(head, files)
+
+    if workers <= 1 or len(head) < INGEST_POOL_MIN_FILES:
+        for full in files:
+            result = _ingest_file(full)
+            _record(result, report)
+            if not result["error"]:
+                yield {"meta": result["meta"], "chunks": result["chunks"]}
+        return
+
+    max_pending = max_pending or 2 * workers
+    # spawn, not fork: callers such as /rebuild run inside a multithreaded
+    # server (torch, worker threads), and forking that can deadlock the child
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    pending = set()
+    try:
+        if ordered:
+            yield from _drain_ordered(executor, files, max_pending, report)
+            return
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                full = next(files, None)
+                if full is None:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(_ingest_file, full))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                result = fut.result()
+                _record(result, report)
+                if not result["error"]:
+                    yield {"meta": result["meta"], "chunks": result["chunks"]}
+    finally:
+        # consumer may stop early; drop queued work instead of finishing it
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def _drain_ordered(executor, files, max_pending, report):
+    window = deque()
+    for full in files:
+        window.append(executor.submit(_ingest_file, full))
+        if len(window) < max_pending:
             continue
-        try:
-            raw = extract_text(full)
-            raw = clean_text(raw)
-            chunks = chunk_text(raw)
-            meta = {"filename": fn, "path": full}
-            docs.append({"meta": meta, "chunks": chunks})
-            print(f"[ingest] {fn} -> {len(chunks)} chunks")
-        except Exception as e:
-            print(f"[ingest] failed {fn}: {e}")
-    return docs
+        result = window.popleft().result()
+        _record(result, report)
+        if not result["error"]:
+            yield {"meta": result["meta"], "chunks": result["chunks"]}
+    while window:
+        result = window.popleft().result()
+        _record(result, report)
+        if not result["error"]:
+            yield {"meta": result["meta"], "chunks": result["chunks"]}
+
+def iter_chunks(folder_path: str, **kwargs) -> Iterator[Tuple[str, Dict]]:
+    """
+    Flatten iter_ingest() into (chunk_text, meta) pairs, meta being
+    {"filename", "chunk_index", "text"} as stored by the index backends.
+    """
+    for d in iter_ingest(folder_path, **kwargs):
+        fn = d["meta"].get("filename", "unknown")
+        for i, chunk in enumerate(d["chunks"]):
+            yield chunk, {"filename": fn, "chunk_index": i, "text": chunk}
+
+def ingest_folder(folder_path: str, workers: Optional[int] = None):
+    return list(iter_ingest(folder_path, workers=workers))
@@ -0,0 +1,206 @@
+# src/journal.py
+"""
+Write-behind journal for the per-ticket persistence writes.
+
+Request threads submit ticket-log, decision, draft and draft-job records; a single
+writer thread drains whatever has queued up and commits it as one group:
+one SQLite transaction per store and one append + fsync per JSONL file.
+
+Durability modes (JOURNAL_DURABILITY):
+  "group"  - callers block until their group is committed and fsynced (default)
+  "async"  - callers return at once; groups are still fsynced in the background
+  "nosync" - callers return at once; no fsync (fastest, loses data on power loss)
+In the non-blocking modes a record may not be readable for a few ms after
+submit(); call flush() where read-your-writes matters.
+
+The stores cannot share one transaction, so outcomes are per submission:
+when a store rejects the group, that store is retried one submission at a
+time and only the submissions it still rejects get the error (and are left
+out of the stores after it).
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+import traceback
+
+from src.logger import write_ticket_logs
+from src.draft_store import save_drafts
+from integration.decision_export import export_decisions
+from automation.draft_worker import save_jobs
+from src.metrics import stage
+
+DURABILITY_MODES = ("group", "async", "nosync")
+JOURNAL_DURABILITY = os.environ.get("JOURNAL_DURABILITY", "group")
+JOURNAL_MAX_BATCH = int(os.environ.get("JOURNAL_MAX_BATCH", "512"))
+# how long the writer lingers for more records before committing a group
+JOURNAL_LINGER_SECONDS = float(os.environ.get("JOURNAL_LINGER_MS", "2")) / 1000.0
+
+_STOP = object()
+RECORD_KINDS = ("ticket_log", "decision", "draft", "draft_job")
+
+
+class _Submission:
+    __slots__ = ("records", "done", "error")
+
+    def __init__(self, records):
+        self.records = records
+        self.done = threading.Event()
+        self.error = None
+
+
+class EventJournal:
+
+    def __init__(self, durability=JOURNAL_DURABILITY, max_batch=JOURNAL_MAX_BATCH,
+                 linger_seconds=JOURNAL_LINGER_SECONDS):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown journal durability {durability!r}; expected one of {DURABILITY_MODES}")
+        self.durability = durability
+        self.max_batch = max_batch
+        self.linger_seconds = linger_seconds
+        self._queue = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self.stats = {"groups": 0, "records": 0, "errors": 0, "commit_seconds": 0.0}
+        self._thread = threading.Thread(target=self._run, name="event-journal", daemon=True)
+        self._thread.start()
+
+    # ----------------------------
+    # Producer API
+    # ----------------------------
+    def submit(self, records, wait=None):
+        """
+        records: list of (kind, record) with kind in RECORD_KINDS.
+        Blocks until committed in "group" mode (or when wait=True).
+        """
+        for kind, _ in records:
+            if kind not in RECORD_KINDS:
+                raise ValueError(f"Unknown journal record kind {kind!r}")
+        sub = _Submission(records)
+        # same lock as close(): nothing can be queued behind _STOP
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("journal is closed")
+            self._queue.put(sub)
+        if wait is None:
+            wait = self.durability == "group"
+        if wait:
+            sub.done.wait()
+            if sub.error is not None:
+                raise sub.error
+        return sub
+
+    def flush(self):
+        """Block until everything submitted so far is committed."""
+        if not self._closed:
+            self.submit([], wait=True)
+
+    def close(self):
+        """Flush and stop the writer; later submits raise."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    # ----------------------------
+    # Writer
+    # ----------------------------
+    def _collect(self, first):
+        group = [first]
+        n = len(first.records)
+        deadline = time.perf_counter() + self.linger_seconds
+        while n < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)  # handled after this group commits
+                break
+            group.append(item)
+            n += len(item.records)
+        return group
+
+    def _commit(self, group):
+        """Write the group store by store. Returns (records written, {submission: error})."""
+        fsync = self.durability != "nosync"
+        writers = (
+            ("ticket_log", "log_ticket", lambda recs: write_ticket_logs(recs, fsync=fsync)),
+            ("decision", "export_decision", lambda recs: export_decisions(recs, fsync=fsync)),
+            ("draft", "save_draft", lambda recs: save_drafts(recs, durable=fsync)),
+            # after the drafts: the worker writes gmail_draft_id back into that row
+            ("draft_job", "enqueue_draft", lambda recs: save_jobs(recs, durable=fsync)),
+        )
+        failed = {}
+        written = 0
+        for kind, stage_name, write in writers:
+            parts = [
+                (sub, [record for k, record in sub.records if k == kind])
+                for sub in group if sub not in failed
+            ]
+            parts = [(sub, recs) for sub, recs in parts if recs]
+            if not parts:
+                continue
+            try:
+                with stage(stage_name):
+                    write([record for _, recs in parts for record in recs])
+                written += sum(len(recs) for _, recs in parts)
+                continue
+            except Exception as e:
+                traceback.print_exc()
+                if len(parts) == 1:
+                    failed[parts[0][0]] = e
+                    continue
+            # isolate the bad submission(s); the rest of the group still commits
+            for sub, recs in parts:
+                try:
+                    with stage(stage_name):
+                        write(recs)
+                    written += len(recs)
+                except Exception as e:
+                    failed[sub] = e
+        return written, failed
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            group = self._collect(item)
+            t0 = time.perf_counter()
+            try:
+                n, failed = self._commit(group)
+            except Exception as e:
+                traceback.print_exc()
+                n, failed = 0, {sub: e for sub in group}
+            self.stats["records"] += n
+            self.stats["errors"] += len(failed)
+            self.stats["groups"] += 1
+            self.stats["commit_seconds"] += time.perf_counter() - t0
+            for sub in group:
+                sub.error = failed.get(sub)
+                sub.done.set()
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal():
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                _journal = EventJournal()
+                # flush-on-shutdown guarantee for normal interpreter exit
+                atexit.register(_journal.close)
+    return _journal
+
+
+def close_journal():
+    if _journal is not None:
+        _journal.close()
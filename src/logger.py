@@ -2,6 +2,8 @@
 
 import sqlite3
 import json
+import os
+import threading
 from datetime import datetime
 from pathlib import Path
 import hashlib
@@ -11,8 +13,17 @@ JSON_PATH = "logs/tickets.jsonl"
 
 Path("logs").mkdir(exist_ok=True)
 
+_local = threading.local()
+_jsonl_lock = threading.Lock()
+
+
 def _get_conn():
-    conn = sqlite3.connect(DB_PATH)
+    # one connection per thread; schema is created the first time only
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        return conn
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("""
         CREATE TABLE IF NOT EXISTS ticket_logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -24,27 +35,197 @@ def _get_conn():
             timestamp TEXT
         )
     """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ticket_logs_ts ON ticket_logs(timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ticket_logs_action_ts ON ticket_logs(action, timestamp)")
+    # hourly rollups, maintained in the same transaction as the inserts
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ticket_hourly (
+            hour TEXT,
+            action TEXT,
+            n INTEGER,
+            confidence_sum REAL,
+            confidence_min REAL,
+            confidence_max REAL,
+            PRIMARY KEY (hour, action)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ticket_hourly_confidence (
+            hour TEXT,
+            bucket INTEGER,
+            n INTEGER,
+            PRIMARY KEY (hour, bucket)
+        )
+    """)
+    conn.execute("CREATE TABLE IF NOT EXISTS rollup_meta (key TEXT PRIMARY KEY, value INTEGER)")
+    conn.commit()
+    _local.conn = conn
     return conn
 
 
-def log_ticket(ticket_id, email, confidence, action, answer):
-    ts = datetime.utcnow().isoformat()
-    answer_hash = hashlib.sha256(answer.encode("utf-8")).hexdigest()[:16]
+# "2026-01-31T14:05:09.123" -> "2026-01-31T14"
+_HOUR = "substr(timestamp, 1, 13)"
+CONFIDENCE_BUCKETS = 10
 
-    conn = _get_conn()
+
+def _roll_up(conn):
+    """
+    Fold ticket_logs rows newer than the last rolled-up id into the hourly
+    tables. Must run inside a write transaction so no row is counted twice.
+    """
+    row = conn.execute("SELECT value FROM rollup_meta WHERE key = 'rolled_up_id'").fetchone()
+    last_id = row[0] if row else 0
+    max_id = conn.execute("SELECT MAX(id) FROM ticket_logs").fetchone()[0] or 0
+    if max_id <= last_id:
+        return
+
+    conn.execute(f"""
+        INSERT INTO ticket_hourly (hour, action, n, confidence_sum, confidence_min, confidence_max)
+        SELECT {_HOUR}, action, COUNT(*), TOTAL(confidence), MIN(confidence), MAX(confidence)
+        FROM ticket_logs WHERE id > ? AND id <= ?
+        GROUP BY {_HOUR}, action
+        ON CONFLICT(hour, action) DO UPDATE SET
+            n = n + excluded.n,
+            confidence_sum = confidence_sum + excluded.confidence_sum,
+            confidence_min = MIN(COALESCE(confidence_min, excluded.confidence_min), excluded.confidence_min),
+            confidence_max = MAX(COALESCE(confidence_max, excluded.confidence_max), excluded.confidence_max)
+    """, (last_id, max_id))
+    conn.execute(f"""
+        INSERT INTO ticket_hourly_confidence (hour, bucket, n)
+        SELECT {_HOUR}, MIN(MAX(CAST(confidence * {CONFIDENCE_BUCKETS} AS INTEGER), 0), {CONFIDENCE_BUCKETS - 1}), COUNT(*)
+        FROM ticket_logs WHERE id > ? AND id <= ? AND confidence IS NOT NULL
+        GROUP BY 1, 2
+        ON CONFLICT(hour, bucket) DO UPDATE SET n = n + excluded.n
+    """, (last_id, max_id))
     conn.execute(
-        "INSERT INTO ticket_logs VALUES (NULL,?,?,?,?,?,?)",
-        (ticket_id, email, confidence, action, answer_hash, ts)
+        "INSERT OR REPLACE INTO rollup_meta (key, value) VALUES ('rolled_up_id', ?)", (max_id,)
     )
-    conn.commit()
-    conn.close()
-
-    with open(JSON_PATH, "a", encoding="utf-8") as f:
-        f.write(json.dumps({
-            "ticket_id": ticket_id,
-            "email": email,
-            "confidence": confidence,
-            "action": action,
-            "answer_hash": answer_hash,
-            "timestamp": ts
-        }) + "\n")
+
+
+def _rollups_stale(conn) -> bool:
+    row = conn.execute(
+        "SELECT (SELECT MAX(id) FROM ticket_logs) > "
+        "COALESCE((SELECT value FROM rollup_meta WHERE key = 'rolled_up_id'), 0)"
+    ).fetchone()
+    return bool(row[0])
+
+
+def refresh_rollups():
+    """
+    Catch the rollups up with rows written by other processes (or before they existed).
+    Writers roll up in their own transaction, so this is normally a plain read
+    and only takes the write lock when rows are actually missing.
+    """
+    conn = _get_conn()
+    if not _rollups_stale(conn):
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _roll_up(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def make_log_record(ticket_id, email, confidence, action, answer):
+    return {
+        "ticket_id": ticket_id,
+        "email": email,
+        "confidence": confidence,
+        "action": action,
+        "answer_hash": hashlib.sha256(answer.encode("utf-8")).hexdigest()[:16],
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def write_ticket_logs(records, fsync: bool = False):
+    """
+    Insert many log records in one transaction and append them to the
+    JSONL mirror with a single write (+ one fsync when requested).
+    """
+    if not records:
+        return
+    conn = _get_conn()
+    conn.execute(f"PRAGMA synchronous={'FULL' if fsync else 'NORMAL'}")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(
+            "INSERT INTO ticket_logs VALUES (NULL,?,?,?,?,?,?)",
+            [
+                (r["ticket_id"], r["email"], r["confidence"], r["action"], r["answer_hash"], r["timestamp"])
+                for r in records
+            ]
+        )
+        _roll_up(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    payload = "".join(json.dumps(r) + "\n" for r in records)
+    with _jsonl_lock:
+        with open(JSON_PATH, "a", encoding="utf-8") as f:
+            f.write(payload)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def log_ticket(ticket_id, email, confidence, action, answer):
+    write_ticket_logs([make_log_record(ticket_id, email, confidence, action, answer)])
+
+
+def ticket_stats(since: str, until: str):
+    """
+    Action counts, confidence distribution and per-hour volume for
+    [since, until), both ISO timestamps. Served from the hourly rollups,
+    so windows are aligned to whole hours.
+    """
+    refresh_rollups()
+    conn = _get_conn()
+    window = (since[:13], until[:13])
+
+    hourly = {}
+    actions = {}
+    total, conf_sum = 0, 0.0
+    conf_min, conf_max = None, None
+    for hour, action, n, c_sum, c_min, c_max in conn.execute(
+        "SELECT hour, action, n, confidence_sum, confidence_min, confidence_max "
+        "FROM ticket_hourly WHERE hour >= ? AND hour < ? ORDER BY hour",
+        window
+    ):
+        bucket = hourly.setdefault(hour, {"hour": hour, "total": 0, "actions": {}})
+        bucket["total"] += n
+        bucket["actions"][action] = n
+        actions[action] = actions.get(action, 0) + n
+        total += n
+        conf_sum += c_sum or 0.0
+        if c_min is not None:
+            conf_min = c_min if conf_min is None else min(conf_min, c_min)
+            conf_max = c_max if conf_max is None else max(conf_max, c_max)
+
+    histogram = [0] * CONFIDENCE_BUCKETS
+    for b, n in conn.execute(
+        "SELECT bucket, SUM(n) FROM ticket_hourly_confidence WHERE hour >= ? AND hour < ? GROUP BY bucket",
+        window
+    ):
+        histogram[b] = n
+    width = 1.0 / CONFIDENCE_BUCKETS
+
+    return {
+        "since": since,
+        "until": until,
+        "total": total,
+        "actions": actions,
+        "confidence": {
+            "avg": conf_sum / total if total else None,
+            "min": conf_min,
+            "max": conf_max,
+            "histogram": [
+                {"range": [round(i * width, 2), round((i + 1) * width, 2)], "count": histogram[i]}
+                for i in range(CONFIDENCE_BUCKETS)
+            ]
+        },
+        "hourly": list(hourly.values())
+    }
@@ -0,0 +1,145 @@
+# src/metrics.py
+"""
+Minimal in-process metrics: fixed-bucket histograms and counters that are
+cheap to update from request threads, snapshot into JSON and render in the
+Prometheus text format for /metrics.
+"""
+import bisect
+import threading
+import time
+
+
+class Histogram:
+    """Cumulative-style buckets: counts[i] = observations <= bounds[i]; last bucket is +Inf."""
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        buckets, running = {}, 0
+        for bound, n in zip(self.bounds + ["+Inf"], counts):
+            running += n
+            buckets[str(bound)] = running
+        return {"count": count, "sum": round(total, 6), "mean": total / count if count else 0.0, "buckets": buckets}
+
+
+class Counter:
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self._value += n
+
+    @property
+    def value(self):
+        return self._value
+
+
+# ----------------------------
+# Registry + Prometheus exposition
+# ----------------------------
+# seconds; Prometheus convention for latency histograms
+LATENCY_BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_families = {}  # name -> {"type", "help", "series": {labels tuple: metric}}
+_registry_lock = threading.Lock()
+
+
+def _get_or_create(kind, name, help_text, labels, factory):
+    key = tuple(sorted(labels.items()))
+    with _registry_lock:
+        family = _families.setdefault(name, {"type": kind, "help": help_text, "series": {}})
+        if key not in family["series"]:
+            family["series"][key] = factory()
+        return family["series"][key]
+
+
+def histogram(name, help_text, bounds=LATENCY_BOUNDS, **labels) -> Histogram:
+    """Registered histogram for (name, labels); look it up once and keep the reference on hot paths."""
+    return _get_or_create("histogram", name, help_text, labels, lambda: Histogram(bounds))
+
+
+def counter(name, help_text, **labels) -> Counter:
+    return _get_or_create("counter", name, help_text, labels, Counter)
+
+
+class _Timer:
+    """Times a block into a histogram; an exception also bumps the error counter."""
+
+    __slots__ = ("seconds", "errors", "_t0")
+
+    def __init__(self, seconds, errors):
+        self.seconds = seconds
+        self.errors = errors
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds.observe(time.perf_counter() - self._t0)
+        if exc_type is not None:
+            self.errors.inc()
+        return False
+
+
+_stages = {}  # stage name -> (histogram, error counter), resolved once
+
+
+def stage(name) -> _Timer:
+    """
+    with stage("chroma_query"): ...
+    Records rag_stage_seconds{stage=name} and, on exceptions,
+    rag_stage_errors_total{stage=name}.
+    """
+    metrics = _stages.get(name)
+    if metrics is None:
+        metrics = _stages.setdefault(name, (
+            histogram("rag_stage_seconds", "Latency of pipeline stages in seconds.", stage=name),
+            counter("rag_stage_errors_total", "Exceptions raised by pipeline stages.", stage=name)
+        ))
+    return _Timer(*metrics)
+
+
+def _labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{str(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def render_prometheus() -> str:
+    """All registered metrics in the Prometheus text exposition format (0.0.4)."""
+    with _registry_lock:
+        families = [(name, dict(f), list(f["series"].items())) for name, f in sorted(_families.items())]
+    lines = []
+    for name, family, series in families:
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for key, metric in sorted(series):
+            if family["type"] == "counter":
+                lines.append(f"{name}{_labels(key)} {metric.value}")
+                continue
+            snap = metric.snapshot()
+            for bound, n in snap["buckets"].items():
+                lines.append(f"{name}_bucket{_labels(key, [('le', bound)])} {n}")
+            lines.append(f"{name}_sum{_labels(key)} {snap['sum']}")
+            lines.append(f"{name}_count{_labels(key)} {snap['count']}")
+    return "\n".join(lines) + "\n"
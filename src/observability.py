@@ -0,0 +1,41 @@
+# src/observability.py
+"""
+Operational endpoints shared by both apps (app_sklearn, app_faiss):
+  GET /metrics        Prometheus scrape: per-stage latency histograms and error counters
+  GET /debug/profile  admin-only sampling profiler, collapsed stacks out
+Mounted with app.include_router(router).
+"""
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.responses import PlainTextResponse
+
+from src.metrics import render_prometheus
+from src.profiler import sample_stacks, collapse, is_admin, ProfilerBusy, PROFILE_INTERVAL_MS, PROFILE_MAX_SECONDS
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint: per-stage latency histograms and error counters."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/debug/profile")
+def debug_profile(
+    seconds: float = Query(10.0, gt=0, le=PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(PROFILE_INTERVAL_MS, ge=1, le=1000),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Admin only (X-Admin-Token = ADMIN_TOKEN): sample all threads for
+    `seconds` and return collapsed stacks for a flamegraph.
+    """
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    try:
+        stacks, rounds = sample_stacks(seconds, interval_ms)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(collapse(stacks), headers={"X-Profile-Rounds": str(rounds)})
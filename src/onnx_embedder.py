@@ -0,0 +1,190 @@
+# src/onnx_embedder.py
+"""
+ONNX Runtime inference for sentence-transformers models on CPU.
+
+Export once (needs torch + sentence-transformers, i.e. the normal install):
+    python -m src.onnx_embedder export --model all-MiniLM-L6-v2
+This writes models/onnx/<model>/ with model.onnx (fp32), model_int8.onnx
+(dynamic int8 quantization), tokenizer.json and onnx_meta.json.
+At runtime only onnxruntime + tokenizers + numpy are needed; select it with
+EMBEDDING_BACKEND=onnx (see src/embeddings.py).
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+ONNX_MODEL_DIR = Path(os.environ.get("ONNX_MODEL_DIR", "models/onnx"))
+# int8 weights by default; ONNX_QUANTIZED=0 runs the fp32 export
+ONNX_QUANTIZED = os.environ.get("ONNX_QUANTIZED", "1") != "0"
+# 0 = let onnxruntime pick (one thread per physical core)
+ONNX_THREADS = int(os.environ.get("ONNX_THREADS", "0"))
+ONNX_BATCH_SIZE = 64
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+META_FILE = "onnx_meta.json"
+
+
+def model_dir(model_name: str) -> Path:
+    return ONNX_MODEL_DIR / model_name.replace("/", "__")
+
+
+# ----------------------------
+# Export (torch side)
+# ----------------------------
+def export_onnx(model_name: str, opset: int = 14, quantize: bool = True) -> Path:
+    """Export the transformer of a SentenceTransformer to ONNX and quantize it."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    out_dir = model_dir(model_name)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0].auto_model.eval()
+    tokenizer = st.tokenizer
+    tokenizer.save_pretrained(str(out_dir))  # writes tokenizer.json (fast tokenizer)
+
+    class _LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                token_type_ids=token_type_ids
+            )[0]
+
+    dummy = tokenizer(["export example"], return_tensors="pt")
+    token_type_ids = dummy.get("token_type_ids", torch.zeros_like(dummy["input_ids"]))
+    dynamic = {0: "batch", 1: "sequence"}
+    torch.onnx.export(
+        _LastHiddenState(transformer),
+        (dummy["input_ids"], dummy["attention_mask"], token_type_ids),
+        str(out_dir / FP32_FILE),
+        input_names=["input_ids", "attention_mask", "token_type_ids"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": dynamic,
+            "attention_mask": dynamic,
+            "token_type_ids": dynamic,
+            "last_hidden_state": dynamic
+        },
+        opset_version=opset
+    )
+
+    meta = {
+        "model_name": model_name,
+        "max_seq_length": st.max_seq_length,
+        "dim": st.get_sentence_embedding_dimension(),
+        # all-MiniLM-L6-v2 ends in a Normalize module: unit-length embeddings
+        "normalize": any(type(m).__name__ == "Normalize" for m in st),
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": tokenizer.pad_token_id
+    }
+    with open(out_dir / META_FILE, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    if quantize:
+        quantize_model(out_dir)
+    print(f"✅ Exported {model_name} to {out_dir}")
+    return out_dir
+
+
+def quantize_model(out_dir: Path):
+    """Dynamic int8 quantization: weights int8 ahead of time, activations per call."""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantize_dynamic(
+        str(out_dir / FP32_FILE),
+        str(out_dir / INT8_FILE),
+        weight_type=QuantType.QInt8
+    )
+
+
+# ----------------------------
+# Runtime
+# ----------------------------
+class OnnxEncoder:
+    """
+    Drop-in for SentenceTransformer.encode: tokenizer + ONNX transformer +
+    mean pooling (+ L2 normalization when the source model had it).
+    """
+
+    def __init__(self, model_name: str, quantized: bool = ONNX_QUANTIZED, threads: int = ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        path = model_dir(model_name)
+        model_file = path / (INT8_FILE if quantized else FP32_FILE)
+        if not model_file.exists():
+            raise RuntimeError(
+                f"❌ ONNX model not found at {model_file}. "
+                f"Run: python -m src.onnx_embedder export --model {model_name}"
+            )
+        with open(path / META_FILE, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        self.tokenizer = Tokenizer.from_file(str(path / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.meta["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.meta["pad_token_id"], pad_token=self.meta["pad_token"])
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(model_file), opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.quantized = quantized
+
+    def _run(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype="int64")
+        mask = np.array([e.attention_mask for e in encodings], dtype="int64")
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype="int64")
+
+        hidden = self.session.run(None, feed)[0]
+        weights = mask[..., None].astype("float32")
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        if self.meta.get("normalize"):
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype("float32")
+
+    def get_sentence_embedding_dimension(self):
+        return self.meta["dim"]
+
+    def encode(self, texts, batch_size: int = ONNX_BATCH_SIZE, **kwargs):
+        """texts: list[str] -> (n, dim) float32. Extra SentenceTransformer kwargs are ignored."""
+        if isinstance(texts, str):
+            return self.encode([texts], batch_size)[0]
+        if len(texts) == 0:
+            return np.zeros((0, self.meta["dim"]), dtype="float32")
+        # length-sorted batches keep padding (wasted compute) low
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        out = np.empty((len(texts), self.meta["dim"]), dtype="float32")
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            out[idx] = self._run([texts[i] for i in idx])
+        return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a sentence-transformers model to (int8) ONNX.")
+    parser.add_argument("command", choices=["export", "quantize"])
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--no-quantize", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(args.model, opset=args.opset, quantize=not args.no_quantize)
+    else:
+        quantize_model(model_dir(args.model))
+        print(f"✅ Quantized {model_dir(args.model) / INT8_FILE}")
@@ -1,9 +1,18 @@
 # src/rag_generate.py
 
-from src.chroma_retriever import retrieve_context
+from src.chroma_retriever import (
+    retrieve_contexts_batch,
+    retrieve_lexical_batch,
+    embed_queries,
+    index_version
+)
+from src.answer_cache import SemanticCache, ANSWER_CACHE_SIZE, dedupe_queries
 
 MAX_CONTEXTS = 3
 
+# near-duplicate tickets reuse a recent answer instead of re-running retrieval
+answer_cache = SemanticCache(version_fn=index_version) if ANSWER_CACHE_SIZE > 0 else None
+
 
 def generate_answer(query: str, top_k: int = MAX_CONTEXTS):
     """
@@ -11,8 +20,64 @@ def generate_answer(query: str, top_k: int = MAX_CONTEXTS):
     Works on ANY raw text (medical, legal, policy, etc.)
     """
 
-    contexts = retrieve_context(query, top_k=top_k)
+    return generate_answers([query], top_k=top_k)[0]
+
+
+def generate_answers(queries, top_k: int = MAX_CONTEXTS):
+    """
+    Batched generate_answer: all queries share one retrieval call.
+    Identifier-heavy queries are served from BM25 alone; of the rest,
+    queries close enough to a cached one (or to an earlier query in the
+    batch) reuse its answer and skip retrieval.
+    """
+    queries = list(queries)
+    if not queries:
+        return []
+
+    # identifier-heavy queries: BM25 only, no embedding, no cache
+    lexical = retrieve_lexical_batch(queries, top_k=top_k)
+    rest = [i for i, contexts in enumerate(lexical) if contexts is None]
+    results = [build_answer(c) if c is not None else None for c in lexical]
+    if rest:
+        for i, answer in zip(rest, _generate_dense([queries[i] for i in rest], top_k)):
+            results[i] = answer
+    return results
+
+
+def _generate_dense(queries, top_k):
+    if answer_cache is None:
+        return [
+            build_answer(contexts)
+            for contexts in retrieve_contexts_batch(queries, top_k=top_k)
+        ]
+
+    embeddings = embed_queries(queries)
+    results = answer_cache.lookup(embeddings, top_k)
+    misses = [i for i, r in enumerate(results) if r is None]
+    if not misses:
+        return results
+
+    leader = dedupe_queries(embeddings[misses], answer_cache.threshold)
+    unique = [misses[j] for j in sorted(set(leader))]
+    fresh = [
+        build_answer(contexts)
+        for contexts in retrieve_contexts_batch(
+            [queries[i] for i in unique], top_k=top_k, query_embeddings=embeddings[unique]
+        )
+    ]
+    answer_cache.insert(embeddings[unique], top_k, fresh)
+
+    by_index = dict(zip(unique, fresh))
+    for n, i in enumerate(misses):
+        results[i] = by_index[misses[leader[n]]]
+    return results
+
+
+def get_cache_stats():
+    return answer_cache.get_stats() if answer_cache is not None else {"enabled": False}
+
 
+def build_answer(contexts):
     if not contexts:
         return {
             "answer": (
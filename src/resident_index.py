@@ -0,0 +1,130 @@
+# src/resident_index.py
+"""
+Shared plumbing for the process-resident vector indexes (sklearn, FAISS,
+hnswlib): the embedding model handle, load/search counters and reloading
+when a build bumps the on-disk version marker.
+
+The marker is checked with a single os.stat per query (mtime comparison),
+never by reading files; the loaded state is swapped in as one tuple so a
+concurrent reload never hands a search mismatched index/meta halves.
+"""
+import os
+import threading
+import time
+
+from src.embeddings import get_embedding_model
+
+
+def write_version_marker(path):
+    """Touch the marker after a successful build; readers reload when its mtime changes."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(str(time.time_ns()))
+
+
+class ResidentIndex:
+    """
+    Subclasses implement _load() -> state tuple and read it back from
+    _ensure_current(); extra stats come from _extra_stats().
+    model overrides the shared embedding model (anything with embed(texts)).
+    """
+
+    def __init__(self, index_path, meta_path, version_path, model=None, **extra_stats):
+        self.index_path = index_path
+        self.meta_path = meta_path
+        self.version_path = version_path
+        self._lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+        self._model = model
+        self._state = None
+        self._version = None
+        self.stats = {
+            "model_load_seconds": 0.0,
+            "index_loads": 0,
+            "index_load_seconds": 0.0,
+            "last_index_load_seconds": 0.0,
+            "searches": 0,
+            "search_seconds": 0.0,
+            **extra_stats
+        }
+
+    def get_model(self):
+        if self._model is not None:
+            return self._model
+        with self._lock:
+            if self._model is None:
+                t0 = time.perf_counter()
+                self._model = get_embedding_model()
+                self._set_stat("model_load_seconds", time.perf_counter() - t0)
+            return self._model
+
+    # ----------------------------
+    # Version tracking
+    # ----------------------------
+    def _read_version(self):
+        """
+        mtime of the version marker; indexes built before the marker existed
+        fall back to the index/meta mtimes. None when nothing is on disk.
+        """
+        try:
+            return os.stat(self.version_path).st_mtime_ns
+        except FileNotFoundError:
+            pass
+        try:
+            return (os.stat(self.index_path).st_mtime_ns, os.stat(self.meta_path).st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+    def _mark_written(self):
+        """After writing the index ourselves: bump the marker without triggering a reload."""
+        write_version_marker(self.version_path)
+        self._version = self._read_version()
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _ensure_current(self):
+        version = self._read_version()
+        state = self._state
+        if state is not None and version == self._version:
+            return state
+        if version is None and state is None:
+            raise RuntimeError("Index or meta not found. Run build_index() first (or call /rebuild).")
+        with self._lock:
+            if version is not None and (self._state is None or version != self._version):
+                t0 = time.perf_counter()
+                self._state = self._load()
+                self._version = version
+                elapsed = time.perf_counter() - t0
+                with self._stats_lock:
+                    self.stats["index_loads"] += 1
+                    self.stats["index_load_seconds"] += elapsed
+                    self.stats["last_index_load_seconds"] = elapsed
+            return self._state
+
+    # ----------------------------
+    # Stats
+    # ----------------------------
+    def _set_stat(self, key, value):
+        with self._stats_lock:
+            self.stats[key] = value
+
+    def _add_stat(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _record_search(self, seconds):
+        with self._stats_lock:
+            self.stats["searches"] += 1
+            self.stats["search_seconds"] += seconds
+
+    def _extra_stats(self):
+        return {}
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["avg_search_seconds"] = (
+            stats["search_seconds"] / stats["searches"] if stats["searches"] else 0.0
+        )
+        stats.update(self._extra_stats())
+        return stats
@@ -0,0 +1,111 @@
+# src/resources.py
+"""
+Registry of heavy, lazily-initialized process resources (models, vector
+store clients, indexes).
+
+Modules register a factory at import time, which costs nothing; the
+resource is built on first get() (or by warmup) exactly once, under a
+per-resource lock. A failed build is remembered for /readyz and retried
+on the next get().
+"""
+import threading
+import time
+import traceback
+
+
+class LazyResource:
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._value = None
+        self._ready = False
+        self.error = None
+        self.init_seconds = None
+
+    @property
+    def ready(self):
+        return self._ready
+
+    def get(self):
+        if self._ready:
+            return self._value
+        with self._lock:
+            if not self._ready:
+                t0 = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                except Exception as e:
+                    self.error = f"{type(e).__name__}: {e}"
+                    raise
+                self.init_seconds = time.perf_counter() - t0
+                self.error = None
+                self._ready = True
+                print(f"[resources] {self.name} ready in {self.init_seconds:.2f}s")
+        return self._value
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self._ready = False
+
+    def status(self):
+        return {
+            "ready": self._ready,
+            "init_seconds": round(self.init_seconds, 3) if self.init_seconds is not None else None,
+            "error": self.error
+        }
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def register(name, factory) -> LazyResource:
+    """Register (or return the already registered) resource `name`."""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = LazyResource(name, factory)
+        return _registry[name]
+
+
+def get(name):
+    return _registry[name].get()
+
+
+def status():
+    return {name: r.status() for name, r in sorted(_registry.items())}
+
+
+# ----------------------------
+# Warmup / readiness
+# ----------------------------
+_warmup = {"state": "pending", "seconds": None, "error": None}
+
+
+def run_warmup(steps):
+    """
+    steps: [(label, fn)] run in order, e.g. building resources and a dummy
+    query to populate caches and allocate buffers. Readiness requires all
+    of them to succeed.
+    """
+    _warmup.update(state="running", error=None)
+    t0 = time.perf_counter()
+    for label, fn in steps:
+        try:
+            fn()
+        except Exception as e:
+            traceback.print_exc()
+            _warmup.update(state="failed", error=f"{label}: {type(e).__name__}: {e}")
+            return False
+    _warmup.update(state="done", seconds=round(time.perf_counter() - t0, 3))
+    return True
+
+
+def warmup_status():
+    return dict(_warmup)
+
+
+def is_ready():
+    return _warmup["state"] == "done"
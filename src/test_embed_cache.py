@@ -0,0 +1,26 @@
+# src/test_embed_cache.py
+#   python -m src.test_embed_cache
+
+from src.embeddings import get_embedding_model, clear_cache, _cache
+
+model = get_embedding_model()
+clear_cache()
+
+texts = ["How do I reset my password?", "Where is my invoice?", "Cancel my subscription"]
+vectors = model.embed(texts)
+
+for text in texts:
+    cached = _cache[(model.model_id, text)]
+    # each entry owns its row; a view would keep the whole batch array alive
+    assert cached.base is None, f"cached vector for {text!r} is a view"
+    assert not cached.flags.writeable
+
+# hits come back equal to the first encode
+assert (model.embed(texts) == vectors).all()
+print(f"✅ {len(texts)} cached vectors own their memory")
+
+# empty input -> (0, dim), on both the cached and uncached paths
+for cache in (True, False):
+    empty = model.embed([], cache=cache)
+    assert empty.shape == (0, vectors.shape[1]) and empty.dtype == "float32"
+print("✅ empty input returns a (0, dim) array")
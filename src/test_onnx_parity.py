@@ -0,0 +1,50 @@
+# src/test_onnx_parity.py
+#
+# Cosine agreement between the PyTorch SentenceTransformer embeddings and the
+# exported ONNX model (fp32 and int8). Export first:
+#   python -m src.onnx_embedder export
+#   python -m src.test_onnx_parity
+
+import sys
+
+import numpy as np
+
+from src.embeddings import EmbeddingModel, MODEL_NAME
+from src.onnx_embedder import OnnxEncoder
+
+# minimum per-sentence cosine similarity to the PyTorch embedding
+MIN_COSINE = {"fp32": 0.999, "int8": 0.98}
+
+sentences = [
+    "How do I reset my password?",
+    "My password reset link expired, please send a new one.",
+    "Error ERR-4021 when uploading the lab report PDF",
+    "What are the symptoms of diabetes?",
+    "Can I take ibuprofen together with my blood pressure medication?",
+    "Refund for order #88231 has not arrived yet",
+    "hi",
+    "The patient portal keeps logging me out after a few minutes of inactivity, "
+    "even though I ticked 'remember me' on the sign in page. " * 8,
+]
+
+reference = EmbeddingModel(MODEL_NAME, backend="torch").embed(sentences, cache=False)
+reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+
+failed = False
+for label, quantized in (("fp32", False), ("int8", True)):
+    vectors = OnnxEncoder(MODEL_NAME, quantized=quantized).encode(sentences)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    cosine = (reference * vectors).sum(axis=1)
+    # nearest neighbours must also agree, not just be close
+    same_nn = np.array_equal(
+        np.argsort(-(reference @ reference.T), axis=1)[:, 1],
+        np.argsort(-(vectors @ vectors.T), axis=1)[:, 1]
+    )
+    ok = cosine.min() >= MIN_COSINE[label] and same_nn
+    failed |= not ok
+    print(
+        f"{'✅' if ok else '❌'} {label}: cosine min={cosine.min():.5f} "
+        f"mean={cosine.mean():.5f} nearest-neighbour agreement={same_nn}"
+    )
+
+sys.exit(1 if failed else 0)
@@ -0,0 +1,126 @@
+# src/ticket_pipeline.py
+
+from concurrent.futures import ThreadPoolExecutor
+import traceback
+
+from src.ticket_schema import SupportTicket
+from src.rag_generate import generate_answer, generate_answers
+from src.automation_rules import decide_action
+from src.logger import make_log_record
+from src.draft_store import make_draft_record, draft_location
+from integration.decision_export import make_decision_record
+from src.journal import get_journal
+from src.metrics import stage
+
+# Gmail drafts are created off the request path by the delivery worker
+from automation.draft_worker import make_job_record
+
+# queries per batched encode + Chroma query
+QUERY_BATCH_SIZE = 256
+# parallel log/export/draft side effects (Gmail calls are network-bound)
+FANOUT_WORKERS = 8
+
+
+def build_query(ticket: SupportTicket) -> str:
+    return f"Subject: {ticket.subject}\nMessage: {ticket.message}"
+
+
+def handle_ticket(ticket: SupportTicket, rag_output: dict) -> dict:
+    """
+    Everything after retrieval: decide, log, export, draft.
+    """
+    answer = rag_output["answer"]
+    confidence = rag_output["confidence"]
+
+    # 2️⃣ Decide action
+    with stage("decide_action"):
+        action = decide_action(confidence)
+
+    # 3️⃣ Log decision
+    records = [("ticket_log", make_log_record(
+        ticket_id=ticket.ticket_id,
+        email=ticket.user_email,
+        confidence=confidence,
+        action=action,
+        answer=answer
+    ))]
+
+    draft_result = None
+    gmail_draft_status = None
+
+    # 4️⃣ Export decision + persist draft
+    if action in ["SAVE_DRAFT", "PENDING_APPROVAL"]:
+        records.append(("decision", make_decision_record(
+            ticket_id=ticket.ticket_id,
+            user_email=ticket.user_email,
+            subject=ticket.subject,
+            answer=answer,
+            confidence=confidence,
+            action=action
+        )))
+        records.append(("draft", make_draft_record(
+            ticket_id=ticket.ticket_id,
+            email=ticket.user_email,
+            body=answer,
+            confidence=confidence,
+            status="PENDING_APPROVAL",
+            gmail_draft_id=None
+        )))
+        # 5️⃣ Queue Gmail draft creation (worker fills gmail_draft_id)
+        records.append(("draft_job", make_job_record(
+            ticket_id=ticket.ticket_id,
+            to_email=ticket.user_email,
+            subject=f"Re: {ticket.subject}",
+            body=answer
+        )))
+        draft_result = draft_location(ticket.ticket_id)
+        gmail_draft_status = "PENDING"
+
+    # every write goes out in one group commit shared with concurrent tickets
+    with stage("journal_commit"):
+        get_journal().submit(records)
+
+    return {
+        "ticket_id": ticket.ticket_id,
+        "user_email": ticket.user_email,
+        "draft_reply": answer,
+        "confidence": confidence,
+        "action": action,
+        "draft_saved": draft_result,
+        "gmail_draft_id": None,
+        "gmail_draft_status": gmail_draft_status,
+        "contexts_used": rag_output["contexts"]
+    }
+
+
+def process_ticket(ticket: SupportTicket) -> dict:
+    # 1️⃣ Build RAG query
+    with stage("retrieval"):
+        rag_output = generate_answer(build_query(ticket))
+    return handle_ticket(ticket, rag_output)
+
+
+def _handle_safely(ticket: SupportTicket, rag_output: dict) -> dict:
+    try:
+        return handle_ticket(ticket, rag_output)
+    except Exception as e:
+        traceback.print_exc()
+        return {"ticket_id": ticket.ticket_id, "error": str(e)}
+
+
+def process_tickets(tickets, batch_size: int = QUERY_BATCH_SIZE, workers: int = FANOUT_WORKERS):
+    """
+    Batch variant of process_ticket.
+    Retrieval runs once per `batch_size` tickets (one encode + one Chroma
+    query); the per-ticket side effects then fan out over a thread pool.
+    A failing ticket is reported in its result and does not stop the batch.
+    Results keep the input order.
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(tickets), batch_size):
+            batch = tickets[start:start + batch_size]
+            with stage("retrieval_batch"):
+                rag_outputs = generate_answers([build_query(t) for t in batch])
+            results.extend(pool.map(_handle_safely, batch, rag_outputs))
+    return results